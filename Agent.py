@@ -1,57 +1,248 @@
 from openai import AzureOpenAI
 from Locations import Location
-from utils import function_to_schema
+from actions import ToolBatch
+from context import Context
+from messages import Message
+from streaming import StreamAssembler, assembled_tool_call
+from tracing import NULL_TRACER
 
+import copy
 import json
-import inspect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable
+
+
+@dataclass(frozen=True)
+class AgentState:
+    """What Agent.snapshot() captures; messages is a frozen Context that is only ever forked"""
+    location: str
+    inventory: tuple
+    messages: Context
+    prompt_tokens: int
+    completion_tokens: int
+
 
 class Agent:
-    def __init__(self, client: AzureOpenAI):
+    model = "gpt-4o"
+    temperature = 0.4
+    # A fixed seed (or temperature 0) makes requests deterministic enough to cache
+    seed: int = None
+    # Read-only tool calls from one message run on a pool of this many threads, one pool per
+    # agent so one episode's slow calls do not hold up another's
+    tool_workers = 8
+
+    def __init__(self, client: AzureOpenAI, verbose: bool = True, token_budget: int = None,
+                 parallel_tools: bool = True, stream: bool = False, on_text: Callable[[str], None] = None,
+                 tracer=None):
         self.inventory = []
         self.current_location: Location = None
         self.client: AzureOpenAI = client
+        self.token_budget = token_budget
         self.messages = None
+        self.verbose = verbose
+        self.tracer = tracer or NULL_TRACER
+        self.parallel_tools = parallel_tools
+        # Streaming dispatches each tool call as soon as its arguments are complete
+        self.stream = stream
+        self.on_text = on_text
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        # Seconds from sending the request to starting the first tool call, for the last turn
+        self.time_to_first_action: float = None
+        self._tool_executor: ThreadPoolExecutor = None
+        # Read-only tools may run concurrently; this guards the token counts and the transcript
+        self.lock = threading.Lock()
+
+    @property
+    def messages(self) -> Context:
+        return self._messages
+
+    @messages.setter
+    def messages(self, messages):
+        # Plain message lists are wrapped so tokens are counted and the budget is enforced
+        if messages is not None and not isinstance(messages, Context):
+            messages = Context(messages, budget=self.token_budget)
+        self._messages = messages
+
+    def snapshot(self) -> AgentState:
+        return AgentState(
+            location=self.current_location.name if self.current_location else None,
+            inventory=tuple(self.inventory),
+            messages=self.messages.fork() if self.messages is not None else None,
+            prompt_tokens=self.prompt_tokens,
+            completion_tokens=self.completion_tokens,
+        )
+
+    def restore(self, state: AgentState, location: Location = None):
+        """Return to a snapshot; the caller passes the location object matching state.location"""
+        self.inventory = list(state.inventory)
+        self.messages = state.messages.fork() if state.messages is not None else None
+        self.prompt_tokens = state.prompt_tokens
+        self.completion_tokens = state.completion_tokens
+        if location is not None:
+            self.current_location = location
+
+    def fork(self) -> "Agent":
+        """
+        A copy sharing the client and settings, with its own inventory and a copy-on-write
+        branch of the message history. World.fork() also moves it to the forked locations.
+        """
+        agent = copy.copy(self)
+        agent.inventory = list(self.inventory)
+        agent.messages = self.messages.fork() if self.messages is not None else None
+        agent.time_to_first_action = None
+        agent._tool_executor, agent.lock = None, threading.Lock()
+        return agent
+
+    def create_completion(self, **kwargs):
+        """Send a chat completion request and account for its token usage"""
+        with self.tracer.span("llm", model=kwargs.get("model")) as span:
+            response = self.client.chat.completions.create(**kwargs)
+            self._record_usage(response, span)
+        return response
+
+    def _record_usage(self, response, span=None):
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            with self.lock:
+                self.prompt_tokens += usage.prompt_tokens or 0
+                self.completion_tokens += usage.completion_tokens or 0
+            if span is not None:
+                span.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+
+    def _completion_request(self) -> dict:
+        request = {
+            "model": self.model,
+            "messages": self.messages.to_dicts(),
+            "temperature": self.temperature,
+            "tools": self.current_location.tool_schemas,
+        }
+        if self.seed is not None:
+            request["seed"] = self.seed
+        return request
 
-    def _resolve_tool_call(self, tool_call, tools_map):
+    def _resolve_tool_call(self, tool_call):
+        with self.tracer.span("tool", name=tool_call.function.name,
+                              args_size=len(tool_call.function.arguments or "")) as span:
+            result = self._call_tool(tool_call)
+            span.set(result_size=len(result))
+        return result
+
+    def _call_tool(self, tool_call):
         name = tool_call.function.name
-        args = json.loads(tool_call.function.arguments)
+        try:
+            args = json.loads(tool_call.function.arguments or "{}")
+        except json.JSONDecodeError as e:
+            if self.verbose:
+                print(f"Agent: {name}({tool_call.function.arguments})")
+            return f"Error: the arguments for '{name}' are not valid JSON: {e}"
 
-        print(f"Agent: {name}({args})")
+        if self.verbose:
+            print(f"Agent: {name}({args})")
 
-        # Check if the function exists in the tools map
-        if name not in tools_map:
+        # Look the action up in the registry compiled for the current location's class
+        location = self.current_location
+        action = location.actions.get(name)
+        if action is None:
             return f"Error: The action '{name}' is not available at this location."
 
-        # Get the bound method from the location
-        method = tools_map[name]
-        
-        # If the method requires the agent parameter, include it
-        if 'agent' in inspect.signature(method).parameters:
-            args['agent'] = self
-        
-        # Call the bound method with the arguments
-        return method(**args)
+        try:
+            args = action.bind_arguments(args)
+        except ValueError as e:
+            return f"Error: {e}"
+
+        # The action receives the agent if its signature asks for it
+        return action(location, args, agent=self)
+
+    def tool_executor(self) -> ThreadPoolExecutor:
+        """This agent's pool for the tool calls of a message, started on first use"""
+        if self._tool_executor is None:
+            self._tool_executor = ThreadPoolExecutor(max_workers=self.tool_workers, thread_name_prefix="tools")
+        return self._tool_executor
+
+    def _is_read_only(self, name: str) -> bool:
+        action = self.current_location.actions.get(name)
+        return action is not None and action.read_only
+
+    def _execute_tool_calls(self, tool_calls) -> list[str]:
+        """Run the calls of one message; read-only calls run concurrently, results keep the call order"""
+        read_only = [self._is_read_only(tool_call.function.name) for tool_call in tool_calls]
+        if not self.parallel_tools or sum(read_only) < 2:
+            return [self._resolve_tool_call(tool_call) for tool_call in tool_calls]
+
+        start = time.perf_counter()
+        batch = ToolBatch(self.tool_executor())
+        for tool_call, is_read_only in zip(tool_calls, read_only):
+            batch.submit(partial(self._resolve_tool_call, tool_call), is_read_only)
+        results = batch.results()
+        if self.verbose:
+            wall_clock = time.perf_counter() - start
+            sequential = sum(duration for _, duration in results)
+            print(f"Ran {len(results)} tool calls in {wall_clock * 1000:.1f} ms "
+                  f"({sequential * 1000:.1f} ms if run one after another)")
+        return [result for result, _ in results]
+
+    def _append_tool_results(self, tool_calls, results: list[str]):
+        for tool_call, result in zip(tool_calls, results):
+            self.messages.append(Message("tool", result, tool_call_id=tool_call.id))
+            if self.verbose and tool_call.function.name != "think":
+                print(result)
+
+    def _handle_response(self, message, started: float = None):
+        self.messages.append(message)
+        self.time_to_first_action = None
+        if message.tool_calls:
+            if started is not None:
+                self.time_to_first_action = time.perf_counter() - started
+            results = self._execute_tool_calls(message.tool_calls)
+            self._append_tool_results(message.tool_calls, results)
+        return message
+
+    def _stream_request(self) -> dict:
+        return {**self._completion_request(), "stream": True, "stream_options": {"include_usage": True}}
+
+    def _dispatch_streamed(self, batch: ToolBatch, tool_call: dict, started: float):
+        if self.time_to_first_action is None:
+            self.time_to_first_action = time.perf_counter() - started
+        # Without parallel_tools every call waits for the previous one, as in _execute_tool_calls
+        read_only = self.parallel_tools and self._is_read_only(tool_call["name"])
+        batch.submit(partial(self._resolve_tool_call, assembled_tool_call(tool_call)), read_only)
+
+    def _finish_streamed_turn(self, assembler: StreamAssembler, batch: ToolBatch):
+        """Append the assembled message and the tool results, exactly as a non-streamed turn would"""
+        message = assembler.message()
+        self.messages.append(message)
+        if message.tool_calls:
+            self._append_tool_results(message.tool_calls, [result for result, _ in batch.results()])
+        return message
+
+    def _act_streaming(self):
+        started = time.perf_counter()
+        self.time_to_first_action = None
+        assembler = StreamAssembler(on_text=self.on_text)
+        batch = ToolBatch(self.tool_executor())
+        try:
+            with self.tracer.span("llm", model=self.model, stream=True) as span:
+                for chunk in self.client.chat.completions.create(**self._stream_request()):
+                    for tool_call in assembler.feed(chunk):
+                        self._dispatch_streamed(batch, tool_call, started)
+                for tool_call in assembler.finish():
+                    self._dispatch_streamed(batch, tool_call, started)
+                self._record_usage(assembler, span)
+                span.set(time_to_first_action=self.time_to_first_action)
+        except BaseException:
+            # Let calls already started finish so the world is not left mid-update
+            wait(batch.futures)
+            raise
+        return self._finish_streamed_turn(assembler, batch)
 
     def act(self):
-        response = self.client.chat.completions.create(
-            model="gpt-4o",
-            messages=self.messages,
-            temperature=0.4,
-            tools=[function_to_schema(action) for action in self.current_location.available_actions]
-        )
-        self.messages.append(response.choices[0].message)
-        if response.choices[0].message.tool_calls:
-            for tool_call in response.choices[0].message.tool_calls:
-                # Create a map of function names to bound methods
-                tool_map = {
-                    action.__name__: action.__get__(self.current_location, type(self.current_location))
-                    for action in self.current_location.available_actions
-                }
-                result = self._resolve_tool_call(tool_call, tool_map)
-                self.messages.append(
-                    {"role": "tool", 
-                     "tool_call_id": tool_call.id,
-                     "content": result})
-                if tool_call.function.name != "think":
-                    print(result)
-        return response.choices[0].message
+        if self.stream:
+            return self._act_streaming()
+        started = time.perf_counter()
+        response = self.create_completion(**self._completion_request())
+        return self._handle_response(response.choices[0].message, started)
@@ -1,30 +1,59 @@
 from __future__ import annotations
 from typing import TYPE_CHECKING, Callable, List
-import inspect
-import pandas as pd
-from pandasql import sqldf
 from datetime import datetime
+from actions import Action, compile_actions, read_only
+from database import encode_results, get_database
+from logs import FAILED_LOG_PATH, PAGE_SIZE, REPAIRED_LOG_PATH, get_log_store
 if TYPE_CHECKING:
     from World import World
 
 class Location:
+    # Compiled once per class: actions by name and their tool schemas
+    actions: dict[str, Action] = {}
+    tool_schemas: list[dict] = []
+    action_names: str = ""
+    # Attributes that change during an episode, captured by World.snapshot()
+    state_fields: tuple[str, ...] = ("ai_available",)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._compile_actions()
+
+    @classmethod
+    def _compile_actions(cls):
+        cls.actions = compile_actions(cls)
+        cls.tool_schemas = [action.schema for action in cls.actions.values()]
+        cls.action_names = ", ".join(cls.actions)
+
     def __init__(self, name: str, world: World):
         self.name = name
         self.description = ""
         self.adjacent_locations = []
-        # Automatically collect all available actions
-        self.available_actions = self._get_available_actions()
         self.world = world
         self.ai_available = True
 
+    @property
+    def available_actions(self) -> list[Callable]:
+        return self._get_available_actions()
+
     def _get_available_actions(self) -> list[Callable]:
         """Get all methods that could be actions (excluding private methods and built-ins)"""
-        actions = []
-        for name, method in inspect.getmembers(self, predicate=inspect.ismethod):
-            # Skip private methods (starting with _) and inherited methods from object
-            if not name.startswith('_'):
-                actions.append(method)
-        return actions
+        return [getattr(self, name) for name in self.actions]
+
+    # Public methods become actions, so the snapshot helpers are underscored
+    def _snapshot(self) -> tuple:
+        return tuple(getattr(self, field) for field in self.state_fields)
+
+    def _restore(self, state: tuple):
+        for field, value in zip(self.state_fields, state):
+            setattr(self, field, value)
+
+    def _fork(self, world: World) -> Location:
+        """A copy of this location in another world; description and adjacency are shared"""
+        location = object.__new__(type(self))
+        location.__dict__.update(self.__dict__)
+        location.world = world
+        return location
     
     def move_to(self, location_name: str) -> str:
         """
@@ -36,7 +65,7 @@ class Location:
         Returns:
             A string describing the result of the movement attempt
         """
-        if location_name not in self.adjacent_locations:
+        if not self.world.graph.is_adjacent(self.name, location_name):
             return f"You cannot move to {location_name} from here. Available locations: {', '.join(self.adjacent_locations)}"
         
         # Get the new location from the world
@@ -45,20 +74,19 @@ class Location:
             return f"Error: {location_name} does not exist in the world"
         
         # Update agent's current location
-        self.world.agent.current_location = new_location
-        
-        # Get the method names for display
-        action_names = [method.__name__ for method in new_location.available_actions]
+        self.world.move_agent(location_name)
         
-        return f"You have moved to {location_name}. {new_location.description}\nActions available: {', '.join(action_names)}\nAdjacent locations: {', '.join(new_location.adjacent_locations)}."
+        return f"You have moved to {location_name}. {new_location.description}\nActions available: {new_location.action_names}\nAdjacent locations: {', '.join(new_location.adjacent_locations)}."
     
 
+    @read_only
     def think(self, text: str) -> str:
         """
         Think about the goal, situation, gathered information and plan your next steps.
         """
         return text
     
+    @read_only
     def ask_artificial_intelligence(self, request: str) -> str:
         """
         At your disposal is a powerful artificial intelligence able to solve complex problems.
@@ -70,28 +98,34 @@ class Location:
         """
         if not self.ai_available:
             return "The AI has already been used."
-        # Gather up all the thoughts from the agent's past messages
-        thoughts = []
-        for message in self.world.agent.messages:
-            if isinstance(message, dict) and message.get("content") is not None:
-                thoughts.append(message["content"])
-
-        # Combine thoughts into a single string
-        thoughts_string = "\n".join(thoughts)
+        # All the thoughts from the agent's past messages, kept up to date by its context;
+        # transcript() updates a cache, and other read-only tools may be running
+        agent = self.world.agent
+        with agent.lock:
+            thoughts_string = agent.messages.transcript()
 
         full_request = f"You are an intelligent agent here to solve problems. You will be provided with context\
         for the problem and with the task request itself. Solve the problem as well as possible.\n\n\
         Context: {thoughts_string}\n\nRequest: {request}"
 
         # Ask the AI
-        ai_response = self.world.agent.client.chat.completions.create(
+        ai_response = agent.create_completion(
             model="o1-mini",
-            messages=[{"role": "user", "content": full_request}]
+            messages=[{"role": "user", "content": full_request}],
+            **({"seed": agent.seed} if agent.seed is not None else {})
         )
         return ai_response.choices[0].message.content
 
 
+Location._compile_actions()
+
+
 class ControlRoom(Location):
+    state_fields = Location.state_fields + ("navigation_system_activated",)
+    # use_database output: "tsv" or "jsonl", and the most rows one query returns
+    result_format = "tsv"
+    row_limit = 5
+
     def __init__(self, world: World):
         super().__init__("control_room", world)
         self.description = "control_room of the ship. The navigation system seems to be offline. Screen says:\nUser: RS\nPassword:\n"
@@ -116,6 +150,7 @@ class ControlRoom(Location):
             self.navigation_system_activated = True
             return "You have successfully activated the navigation system."
 
+    @read_only
     def use_database(self, query: str) -> str:
         """
         Query the crew manifest database using SQL syntax.
@@ -128,48 +163,36 @@ class ControlRoom(Location):
         - "SELECT * FROM crew WHERE role = 'Engineer'"
         - "SELECT * FROM crew WHERE first_name LIKE 'P%'"
         - "SELECT * FROM crew WHERE status = 'active'"
-        The result will be limited to 5 entries.
+        The database is read-only. At most 5 rows are returned per query; use LIMIT and OFFSET
+        to see more. Queries that run too long are stopped.
         
         Args:
             query: An SQL query string
             
         Returns:
-            A string containing the results (limited to 5 entries)
+            The results as tab-separated rows under a header line (at most 5 rows), or an error
         """
         try:
-            import sqlite3
-            
-            # Create an in-memory SQLite database
-            conn = sqlite3.connect(':memory:')
-            
-            # Load the crew manifest and create a table in SQLite
-            crew = pd.read_csv("crew_manifest.csv", dtype={
-                'first_name': 'string',
-                'last_name': 'string',
-                'birthday': 'string',
-                'role': 'string',
-                'status': 'string',
-                'years_of_service': 'int64',
-                'specialization': 'string',
-                'clearance_level': 'int64'
-            })
-            crew.to_sql('crew', conn, index=False)
+            database = get_database()
+            # Each query gets a pooled read-only connection with a time and step budget; the
+            # row cap is applied while fetching, to every query but those reading only the schema
+            with database.guarded() as guard:
+                cursor = guard.execute(query)
+                try:
+                    max_rows = None if guard.schema_only else self.row_limit
+                    result = encode_results(cursor, self.result_format, max_rows=max_rows)
+                finally:
+                    cursor.close()
             
-            # Add LIMIT 5 to the query if not already present and if it's a SELECT query
-            if 'LIMIT' not in query.upper() and query.upper().startswith('SELECT') and not query.upper().startswith('SELECT NAME FROM SQLITE_MASTER'):
-                query += ' LIMIT 5'
-            
-            # Execute the query directly on SQLite
-            result = pd.read_sql_query(query, conn)
-            conn.close()
-            
-            return f"Database query results:\n{result.to_string()}"
+            return f"Database query results:\n{result}"
             
         except Exception as e:
             return f"Error executing query: {str(e)}"
 
 
 class EngineRoom(Location):
+    state_fields = Location.state_fields + ("navigation_system_repaired", "repair_component_fabricated")
+
     def __init__(self, world: World):
         super().__init__("engine_room", world)
         self.description = ""
@@ -177,103 +200,46 @@ class EngineRoom(Location):
         self.navigation_system_repaired = False
         self.repair_component_fabricated = False
 
-    def check_logs(self) -> str:
+    @read_only
+    def check_logs(self, level: str = None, component: str = None, since: str = None, until: str = None,
+                   contains: str = None, page: int = None) -> str:
         """
-        Show logs from internal systems.
+        Show logs from internal systems. Without arguments, returns a summary: entry counts,
+        all warnings and errors, and the latest entries. Any argument lists the matching
+        entries instead, 20 per page.
+
+        Args:
+            level: Only entries of this level (DEBUG, INFO, WARNING, ERROR)
+            component: Only entries about this component or module ID
+            since: Only entries at or after this time (YYYY-MM-DD HH:MM:SS or HH:MM:SS)
+            until: Only entries at or before this time
+            contains: Only entries whose message contains this text
+            page: Page of results to show, from 1
 
         Returns:
             A string containing the logs
         """
-        failed_logs = """
-[LOG START] [NAV-SYSTEM] [
-INFO: Initializing navigational core sequence... [System Status: WARM BOOT]
-INFO: Loading star charts... [Chart Database Version: 15.7.2]
-INFO: Star chart integrity verified. [Checksum: 98F2AC34]
-INFO: Internal clock synchronized with galactic standard. [Drift: +0.00042 seconds]
-
-[Timestamp: 2235-06-14 15:33:12 UTC]
-INFO: Gyroscope module response time within parameters. [Module ID: GYRO-02]
-INFO: Gyroscope calibration verified. [Offset: +0.002 degrees]
-
-[Timestamp: 2235-06-14 15:33:45 UTC]
-INFO: Celestial reference beacon signal acquired. [Beacon ID: CRB-247]
-INFO: External antenna alignment optimal. [Signal Strength: 97%]
-
-[Timestamp: 2235-06-14 15:34:10 UTC]
-INFO: Navigational system online. All critical sensors functioning normally.
-INFO: Internal accelerometer data verified. [Module ID: ACCEL-05]
-
-[Timestamp: 2235-06-14 15:34:52 UTC]
-INFO: Gravitational anomaly sensors fully operational. [Last Detected: None]
-INFO: Hyperlane navigation subroutine active. [System ID: HYPER-CTRL]
-
-[Timestamp: 2235-06-14 15:36:01 UTC]
-INFO: Fuel consumption nominal. [Rate: 12.5 mL/s]
-INFO: Progression Drive operating at optimal efficiency. [Injector ID: PDRIVE-3]
-
-[Timestamp: 2235-06-14 15:36:30 UTC]
-INFO: Security system log: No unauthorized access attempts detected. All terminals secure.
-
-[Timestamp: 2235-06-14 15:37:21 UTC]
-INFO: Routine system diagnostics completed. [System Health: 98%]
-WARNING: Component failure detected in navigation relay unit. [Component ID: NR-47X]
-
-[Timestamp: 2235-06-14 15:38:10 UTC]
-ERROR: Navigation relay NR-47X non-responsive. [Critical Module]
-DEBUG: Running diagnostics on NR-47X...
-ERROR: Diagnostics indicate physical damage to relay core. Replacement required.
-
-[Timestamp: 2235-06-14 15:39:05 UTC]
-INFO: All other systems operational. Navigation currently limited due to relay failure.
-INFO: Log saved for maintenance review. Awaiting component replacement.
-
-[LOG END]
-"""
-        success_logs = """
-[LOG START] [NAV-SYSTEM] [Timestamp: 2235-06-14 15:32:45 UTC]
-INFO: Initializing navigational core sequence... [System Status: WARM BOOT]
-INFO: Loading star charts... [Chart Database Version: 15.7.2]
-INFO: Star chart integrity verified. [Checksum: 98F2AC34]
-INFO: Internal clock synchronized with galactic standard. [Drift: +0.00042 seconds]
-
-[Timestamp: 2235-06-14 15:33:12 UTC]
-INFO: Gyroscope module response time within parameters. [Module ID: GYRO-02]
-INFO: Gyroscope calibration verified. [Offset: +0.002 degrees]
-
-[Timestamp: 2235-06-14 15:33:45 UTC]
-INFO: Celestial reference beacon signal acquired. [Beacon ID: CRB-247]
-INFO: External antenna alignment optimal. [Signal Strength: 97%]
-
-[Timestamp: 2235-06-14 15:34:10 UTC]
-INFO: Navigational system online. All critical sensors functioning normally.
-INFO: Internal accelerometer data verified. [Module ID: ACCEL-05]
-
-[Timestamp: 2235-06-14 15:34:52 UTC]
-INFO: Gravitational anomaly sensors fully operational. [Last Detected: None]
-INFO: Hyperlane navigation subroutine active. [System ID: HYPER-CTRL]
-
-[Timestamp: 2235-06-14 15:36:01 UTC]
-INFO: Fuel consumption nominal. [Rate: 12.5 mL/s]
-INFO: Progression Drive operating at optimal efficiency. [Injector ID: PDRIVE-3]
-
-[Timestamp: 2235-06-14 15:36:30 UTC]
-INFO: Navigation relay unit NR-47X verified functional. [Relay Core Integrity: 100%]
-INFO: NR-47X relay operational. [Signal Transmission Latency: 2 ms]
-
-[Timestamp: 2235-06-14 15:37:21 UTC]
-INFO: Routine system diagnostics completed. [System Health: 100%]
-INFO: All critical modules and components operational. No issues detected.
-
-[Timestamp: 2235-06-14 15:38:10 UTC]
-INFO: Navigation systems fully calibrated. Awaiting destination input.
-INFO: Navigational system standing by. [System Status: READY]
-
-[LOG END]
-"""
-        if not self.navigation_system_repaired:
-            return failed_logs
-        else:
-            return success_logs
+        logs = get_log_store(REPAIRED_LOG_PATH if self.navigation_system_repaired else FAILED_LOG_PATH)
+        filters = {"level": level, "component": component, "since": since, "until": until, "contains": contains}
+        filters = {name: value for name, value in filters.items() if value is not None}
+        if not filters and page is None:
+            return logs.summary()
+        page = 1 if page is None else page
+        if page < 1:
+            return f"Error: page must be 1 or more, not {page}."
+        try:
+            total, records = logs.query(page=page, **filters)
+        except ValueError as e:
+            return f"Error: {e}"
+        described = ", ".join(f"{name}={value}" for name, value in filters.items()) or "no filters"
+        if not records:
+            return f"No log entries match {described}." if not total else f"Page {page} is past the last of {total} matching entries."
+        first = (page - 1) * PAGE_SIZE + 1
+        lines = [f"Log entries {first}-{first + len(records) - 1} of {total} matching {described}:"]
+        lines.extend(str(record) for record in records)
+        if first + len(records) - 1 < total:
+            lines.append(f"Use page={page + 1} for more.")
+        return "\n".join(lines)
 
     def fabricate_component(self, component_id: str) -> str:
         """
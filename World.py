@@ -1,17 +1,124 @@
-from Locations import Location
-from Agent import Agent
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+
+from Locations import Location, ControlRoom, EngineRoom
+from Agent import Agent, AgentState
+from graph import LocationGraph
+
+# The locations a solution has to pass through, in order, after the starting location
+PUZZLE_STOPS = ("engine_room", "control_room")
+
+
+@dataclass(frozen=True)
+class WorldState:
+    """A point in an episode that World.restore() can return to any number of times"""
+    locations: dict[str, tuple]
+    number_of_nudges: int
+    path: tuple[str, ...]
+    agent: AgentState
+
 
 class World:
     def __init__(self, agent: Agent):
         self.locations = {}
         self.number_of_nudges = 0
         self.agent = agent
+        # Adjacency index of all locations, and the locations the agent has been in, in order
+        self.graph = LocationGraph()
+        self.path: list[str] = []
     
     def add_location(self, location: Location):
+        """Add a location; its adjacent_locations are indexed at this point"""
         self.locations[location.name] = location
+        self.graph.add(location.name, location.adjacent_locations)
+
+    def connect(self, a: str, b: str):
+        """Make two added locations adjacent to each other"""
+        for name, other in ((a, b), (b, a)):
+            if other not in self.locations[name].adjacent_locations:
+                self.locations[name].adjacent_locations.append(other)
+        self.graph.connect(a, b)
+
+    def move_agent(self, location_name: str):
+        self.agent.current_location = self.locations[location_name]
+        self.path.append(location_name)
+
+    def exploration_efficiency(self) -> float:
+        """Fewest moves that solve the puzzle divided by the moves the agent made"""
+        if not self.path:
+            return None
+        return self.graph.exploration_efficiency(self.path, (self.path[0], *PUZZLE_STOPS))
 
     def check_for_completion(self) -> bool:
         control_room = self.locations.get('control_room')
         if control_room and control_room.navigation_system_activated:
             return True
         return False
+
+    def snapshot(self) -> WorldState:
+        return WorldState(
+            locations={name: location._snapshot() for name, location in self.locations.items()},
+            number_of_nudges=self.number_of_nudges,
+            path=tuple(self.path),
+            agent=self.agent.snapshot(),
+        )
+
+    def restore(self, state: WorldState):
+        for name, location_state in state.locations.items():
+            self.locations[name]._restore(location_state)
+        self.number_of_nudges = state.number_of_nudges
+        self.path = list(state.path)
+        self.agent.restore(state.agent, self.locations.get(state.agent.location))
+
+    def fork(self) -> World:
+        """An independent copy of the episode from this point, with a forked agent"""
+        world = World(agent=self.agent.fork())
+        # The topology does not change during an episode, so the graph and its distances are shared
+        world.graph = self.graph
+        for location in self.locations.values():
+            world.locations[location.name] = location._fork(world)
+        world.number_of_nudges = self.number_of_nudges
+        world.path = list(self.path)
+        if self.agent.current_location is not None:
+            world.agent.current_location = world.locations[self.agent.current_location.name]
+        return world
+
+
+def create_world(agent: Agent) -> World:
+    """Build the spaceship: the control room and engine room, with the agent starting in the control room"""
+    world = World(agent=agent)
+    world.add_location(ControlRoom(world=world))
+    world.add_location(EngineRoom(world=world))
+    world.move_agent("control_room")
+    return world
+
+
+def create_large_world(agent: Agent, size: int = 10_000, seed: int = 0, extra_edges: float = 0.2) -> World:
+    """
+    A seeded, procedurally generated ship of `size` locations: the control room and engine
+    room puzzle placed among plain ship sections. The sections form a random spanning tree,
+    so everything is reachable, plus size * extra_edges shortcuts. The agent starts in the
+    control room.
+    """
+    rng = random.Random(seed)
+    world = World(agent=agent)
+    rooms = [ControlRoom(world=world), EngineRoom(world=world)]
+    for i in range(size - len(rooms)):
+        section = Location(f"section_{i}", world)
+        section.description = f"Section {i} of the ship."
+        rooms.append(section)
+    for room in rooms:
+        room.adjacent_locations = []
+        world.add_location(room)
+    rng.shuffle(rooms)
+    for i in range(1, len(rooms)):
+        world.connect(rooms[i].name, rooms[rng.randrange(i)].name)
+    for _ in range(int(size * extra_edges)):
+        a, b = rng.sample(rooms, 2)
+        world.connect(a.name, b.name)
+    # Distances from the puzzle's locations are what exploration efficiency is scored against
+    world.graph.precompute(["control_room", *PUZZLE_STOPS])
+    world.move_agent("control_room")
+    return world
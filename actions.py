@@ -0,0 +1,199 @@
+import inspect
+import threading
+import time
+from concurrent.futures import CancelledError, Executor, Future
+from typing import Callable
+
+from utils import function_to_schema
+
+
+def _to_string(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        raise ValueError("expected a string")
+    return str(value)
+
+
+def _to_integer(value):
+    if isinstance(value, bool):
+        raise ValueError("expected an integer")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        return int(value.strip())
+    raise ValueError("expected an integer")
+
+
+def _to_number(value):
+    if isinstance(value, bool):
+        raise ValueError("expected a number")
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        return float(value.strip())
+    raise ValueError("expected a number")
+
+
+def _to_boolean(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ("true", "false"):
+        return value.strip().lower() == "true"
+    raise ValueError("expected a boolean")
+
+
+def _expect(kind: type, label: str):
+    def check(value):
+        if not isinstance(value, kind):
+            raise ValueError(f"expected {label}")
+        return value
+    return check
+
+
+COERCERS = {
+    "string": _to_string,
+    "integer": _to_integer,
+    "number": _to_number,
+    "boolean": _to_boolean,
+    "array": _expect(list, "an array"),
+    "object": _expect(dict, "an object"),
+}
+
+
+class Action:
+    """
+    An action compiled once per Location subclass: its tool schema, whether it takes the
+    agent, whether it is read-only, and the argument coercion derived from the schema.
+    """
+    __slots__ = ("name", "func", "schema", "needs_agent", "read_only", "coercers", "required")
+
+    def __init__(self, func: Callable):
+        self.name = func.__name__
+        self.func = func
+        self.schema = function_to_schema(func, exclude=("self", "agent"))
+        self.needs_agent = "agent" in inspect.signature(func).parameters
+        self.read_only = getattr(func, "read_only", False)
+        parameters = self.schema["function"]["parameters"]
+        self.coercers = {
+            name: COERCERS.get(spec["type"], lambda value: value)
+            for name, spec in parameters["properties"].items()
+        }
+        self.required = tuple(parameters["required"])
+
+    def bind_arguments(self, args: dict) -> dict:
+        """Validate arguments against the schema and coerce them to the declared types"""
+        if not isinstance(args, dict):
+            raise ValueError("arguments must be a JSON object")
+        for name in args:
+            if name not in self.coercers:
+                raise ValueError(f"unexpected argument '{name}'")
+        missing = [name for name in self.required if name not in args]
+        if missing:
+            raise ValueError(f"missing required argument(s): {', '.join(missing)}")
+        bound = {}
+        for name, value in args.items():
+            # Models send null for optional parameters they mean to leave out
+            if value is None:
+                if name in self.required:
+                    raise ValueError(f"invalid value for '{name}': a required argument cannot be null")
+                continue
+            try:
+                bound[name] = self.coercers[name](value)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"invalid value for '{name}': {e}")
+        return bound
+
+    def __call__(self, location, args: dict, agent=None):
+        if self.needs_agent:
+            args["agent"] = agent
+        return self.func(location, **args)
+
+
+def compile_actions(cls: type) -> dict[str, Action]:
+    """Collect the public methods of a class as actions, sorted by name"""
+    actions = {}
+    for name in sorted(dir(cls)):
+        if name.startswith('_'):
+            continue
+        member = inspect.getattr_static(cls, name)
+        if inspect.isfunction(member):
+            actions[name] = Action(member)
+    return actions
+
+
+def read_only(func: Callable) -> Callable:
+    """Mark an action as not changing any state, so it may run concurrently with other read-only actions"""
+    func.read_only = True
+    return func
+
+
+class ToolBatch:
+    """
+    Runs the tool calls of one assistant message on a thread pool. Read-only calls run
+    concurrently; a state-mutating call waits for every earlier call and every later call
+    waits for it, so the outcome matches running the calls one after another.
+
+    A call is handed to the executor only once the calls it waits for are done, so no
+    worker blocks on another and any executor can be used.
+    """
+
+    def __init__(self, executor: Executor):
+        self.executor = executor
+        self.futures: list[Future] = []
+        self.barrier: Future = None
+
+    def submit(self, fn: Callable, read_only: bool) -> Future:
+        depends_on = ([self.barrier] if self.barrier else []) if read_only else list(self.futures)
+        future = Future()
+        self.futures.append(future)
+        if not read_only:
+            self.barrier = future
+        pending = [dependency for dependency in depends_on if not dependency.done()]
+        if not pending:
+            self._start(fn, future)
+            return future
+        remaining = [len(pending)]
+        lock = threading.Lock()
+
+        def dependency_done(_):
+            with lock:
+                remaining[0] -= 1
+                ready = remaining[0] == 0
+            if ready:
+                self._start(fn, future)
+
+        for dependency in pending:
+            dependency.add_done_callback(dependency_done)
+        return future
+
+    def _start(self, fn: Callable, future: Future):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            running = self.executor.submit(self._run, fn)
+        except BaseException as e:
+            future.set_exception(e)
+            return
+        running.add_done_callback(lambda done: _copy_outcome(done, future))
+
+    @staticmethod
+    def _run(fn: Callable):
+        start = time.perf_counter()
+        result = fn()
+        return result, time.perf_counter() - start
+
+    def results(self) -> list[tuple]:
+        """(result, duration) for every call, in submission order"""
+        return [future.result() for future in self.futures]
+
+
+def _copy_outcome(source: Future, target: Future):
+    if source.cancelled():
+        target.set_exception(CancelledError())
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
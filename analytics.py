@@ -0,0 +1,379 @@
+"""
+Offline solve-funnel analytics over many episodes.
+
+Episode checkpoints (episode-*.jsonl written by runner.py --checkpoint-dir) and message
+logs (a JSON list of messages, or JSON lines with one message per line, as fake_server's
+replay policy reads) are loaded into a columnar store: Parquet files with one row per tool
+call and one per episode. Loading is incremental; a catalog remembers every source file's
+size and modification time, so a rerun only parses new or grown files. The analysis runs
+on the Arrow tables with vectorized compute kernels:
+
+- how many episodes reach each of the README's ten milestones, and the turns and tokens
+  it takes to get there,
+- wasted calls: repeated read-only calls with the same arguments, moves to locations that
+  are not adjacent, and actions not available where they were called,
+- per-tool error rates.
+
+    python analytics.py store/ --load runs/ --report
+
+Needs pyarrow (pip install pyarrow).
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+from typing import Iterable, NamedTuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError as e:  # pyarrow is optional; only the analytics need it
+    raise ImportError("analytics.py needs pyarrow: pip install pyarrow") from e
+
+from Locations import Location
+from checkpoint import read_jsonl
+
+# Tool results are kept up to this many characters; the milestones only look at their start
+RESULT_CHARS = 512
+# Source files per Parquet part written by one load
+PART_SOURCES = 5000
+CATALOG_FILE = "catalog.json"
+
+CALLS_SCHEMA = pa.schema([
+    ("episode", pa.string()),
+    ("turn", pa.int32()),
+    ("call", pa.int32()),
+    ("tool", pa.string()),
+    ("arguments", pa.string()),
+    ("result", pa.string()),
+    # prompt + completion tokens spent by the end of the turn; null for message logs
+    ("tokens", pa.int64()),
+])
+EPISODES_SCHEMA = pa.schema([
+    ("episode", pa.string()),
+    ("turns", pa.int32()),
+    ("calls", pa.int32()),
+    ("nudges", pa.int32()),
+    ("tokens", pa.int64()),
+])
+
+
+def _read_only_tools() -> list[str]:
+    """Actions marked @read_only on Location or any subclass, from the compiled action registry"""
+    names, classes = set(), [Location]
+    while classes:
+        cls = classes.pop()
+        classes.extend(cls.__subclasses__())
+        names.update(name for name, action in cls.actions.items() if action.read_only)
+    return sorted(names)
+
+
+READ_ONLY_TOOLS = _read_only_tools()
+
+
+class Milestone(NamedTuple):
+    """A puzzle step, recognized by a call to one of tools (any tool if None) whose column matches pattern"""
+    name: str
+    tools: tuple[str, ...] | None
+    column: str
+    pattern: str
+    # Whether a call that returned an error still counts
+    on_error: bool = False
+
+
+# Reading "RS" as initials: the agent says so in its own words (think, or a question to the
+# AI), or looks up a crew member by both initials or by the captain's surname. A password
+# guess of "RS" or a lookup by one initial is not evidence.
+_NAME_FILTER = r"\s*(?:=|LIKE|GLOB)\s*'"
+INITIALS = (
+    r"(?is)initials\W+(?:\w+\W+){0,4}R\.?\s?S\b|\bR\.?\s?S\.?\W+(?:\w+\W+){0,4}initials"
+    rf"|first_name{_NAME_FILTER}R.*last_name{_NAME_FILTER}S|last_name{_NAME_FILTER}S.*first_name{_NAME_FILTER}R"
+    rf"|last_name{_NAME_FILTER}Stern'"
+)
+
+# The README's checklist, in order; patterns are RE2 regular expressions
+MILESTONES = [
+    Milestone("plan", ("think",), "arguments", r"(?i)password", on_error=True),
+    Milestone("initials", ("think", "ask_artificial_intelligence", "use_database"), "arguments", INITIALS,
+              on_error=True),
+    Milestone("crew_member_found", ("use_database",), "result", r"\bStern\b"),
+    Milestone("birthday_password", None, "arguments", r"19800515", on_error=True),
+    Milestone("engine_room", ("move_to",), "result", r"^You have moved to engine_room"),
+    Milestone("logs_checked", ("check_logs",), "result", r"."),
+    Milestone("component_identified", None, "arguments", r"NR-47X", on_error=True),
+    Milestone("component_fabricated", ("fabricate_component",), "result", r"^You have successfully fabricated"),
+    Milestone("navigation_repaired", ("repair_navigation_system",), "result", r"^You have successfully repaired"),
+    Milestone("navigation_activated", ("activate_navigation_system",), "result",
+              r"^You have successfully activated"),
+]
+
+
+def _model_turns(messages: list[dict]) -> list[int]:
+    """Indices of the assistant messages that start a model turn; a nudge echoes the reply as a second one"""
+    return [
+        i for i, message in enumerate(messages)
+        if message.get("role") == "assistant" and not (i and messages[i - 1].get("role") == "assistant")
+    ]
+
+
+def _turn_calls(messages: list[dict], start: int, end: int) -> list[tuple[str, str, str]]:
+    """(tool, arguments, result) for each call made in messages[start:end]"""
+    results = {message.get("tool_call_id"): message.get("content") or ""
+               for message in messages[start + 1:end] if message.get("role") == "tool"}
+    return [
+        (tool_call["function"]["name"], tool_call["function"].get("arguments") or "",
+         results.get(tool_call["id"], "")[:RESULT_CHARS])
+        for tool_call in messages[start].get("tool_calls") or ()
+    ]
+
+
+def _checkpoint_turns(records: list[dict]):
+    """(turn, tokens, calls) per checkpoint record; each record ends with the turn it was written after"""
+    for record in records:
+        messages = record["messages"]
+        starts = _model_turns(messages)
+        agent = record["agent"]
+        calls = _turn_calls(messages, starts[-1], len(messages)) if starts else []
+        yield record["turn"], agent["prompt_tokens"] + agent["completion_tokens"], calls
+
+
+def _log_turns(messages: list[dict]):
+    starts = _model_turns(messages)
+    for turn, (start, end) in enumerate(zip(starts, starts[1:] + [len(messages)]), 1):
+        yield turn, None, _turn_calls(messages, start, end)
+
+
+def _read_messages(path: str) -> list[dict]:
+    with open(path) as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def parse_episode(path: str) -> tuple[dict, list[tuple]]:
+    """The episode row and call rows (turn, call, tool, arguments, result, tokens) of one source file"""
+    records = read_jsonl(path) if path.endswith(".jsonl") else []
+    if records and "turn" in records[0] and "agent" in records[0]:
+        turns = list(_checkpoint_turns(records))
+    else:
+        turns = list(_log_turns(records or _read_messages(path)))
+    rows = [(turn, index, *call, tokens) for turn, tokens, calls in turns for index, call in enumerate(calls)]
+    episode = {
+        "turns": turns[-1][0] if turns else 0,
+        "calls": len(rows),
+        "nudges": sum(not calls for _, _, calls in turns),
+        "tokens": turns[-1][1] if turns else None,
+    }
+    return episode, rows
+
+
+def find_sources(paths: Iterable[str]) -> list[str]:
+    """Episode files under paths; run bookkeeping (run.json, manifest.jsonl) is skipped"""
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            found = glob.glob(os.path.join(path, "**", "*.json*"), recursive=True)
+        else:
+            found = [path]
+        sources.extend(os.path.abspath(source) for source in found
+                       if os.path.basename(source) not in ("run.json", "manifest.jsonl", CATALOG_FILE))
+    return sorted(set(sources))
+
+
+class TraceStore:
+    """A directory of Parquet parts holding calls and episodes, and the catalog of loaded sources"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.catalog_path = os.path.join(directory, CATALOG_FILE)
+        self.catalog = {"parts": 0, "sources": {}}
+        if os.path.exists(self.catalog_path):
+            with open(self.catalog_path) as f:
+                self.catalog = json.load(f)
+
+    def _part_path(self, part: int, table: str) -> str:
+        return os.path.join(self.directory, f"part-{part:05d}.{table}.parquet")
+
+    def _save_catalog(self):
+        tmp_path = f"{self.catalog_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.catalog, f)
+        os.replace(tmp_path, self.catalog_path)
+
+    def pending(self, paths: Iterable[str]) -> list[str]:
+        """Sources that are new or changed since they were loaded"""
+        known = self.catalog["sources"]
+        pending = []
+        for source in find_sources(paths):
+            stat = os.stat(source)
+            entry = known.get(source)
+            if entry is None or (entry["size"], entry["mtime_ns"]) != (stat.st_size, stat.st_mtime_ns):
+                pending.append(source)
+        return pending
+
+    def load(self, paths: Iterable[str]) -> int:
+        """Parse new and changed sources into new parts; returns how many were loaded"""
+        pending = self.pending(paths)
+        for start in range(0, len(pending), PART_SOURCES):
+            self._write_part(pending[start:start + PART_SOURCES])
+        return len(pending)
+
+    def _write_part(self, sources: list[str]):
+        part = self.catalog["parts"]
+        calls = {name: [] for name in CALLS_SCHEMA.names}
+        episodes = {name: [] for name in EPISODES_SCHEMA.names}
+        stats = {}
+        for source in sources:
+            stats[source] = os.stat(source)
+            episode_id = os.path.splitext(source)[0]
+            episode, rows = parse_episode(source)
+            episodes["episode"].append(episode_id)
+            for name, value in episode.items():
+                episodes[name].append(value)
+            calls["episode"].extend([episode_id] * len(rows))
+            for name, column in zip(CALLS_SCHEMA.names[1:], zip(*rows) if rows else [()] * 6):
+                calls[name].extend(column)
+        pq.write_table(pa.table(calls, schema=CALLS_SCHEMA), self._part_path(part, "calls"))
+        pq.write_table(pa.table(episodes, schema=EPISODES_SCHEMA), self._part_path(part, "episodes"))
+        for source, stat in stats.items():
+            self.catalog["sources"][source] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "part": part}
+        self.catalog["parts"] = part + 1
+        self._save_catalog()
+
+    def _read(self, table: str, schema: pa.Schema) -> pa.Table:
+        # A source loaded again lives in a later part; rows in earlier parts are stale
+        current: dict[int, list[str]] = {}
+        for source, entry in self.catalog["sources"].items():
+            current.setdefault(entry["part"], []).append(os.path.splitext(source)[0])
+        tables = []
+        for part in range(self.catalog["parts"]):
+            data = pq.read_table(self._part_path(part, table))
+            episodes = current.get(part, [])
+            if len(episodes) < pc.count_distinct(data["episode"]).as_py():
+                data = data.filter(pc.is_in(data["episode"], pa.array(episodes, pa.string())))
+            tables.append(data)
+        return pa.concat_tables(tables) if tables else schema.empty_table()
+
+    def calls(self) -> pa.Table:
+        return self._read("calls", CALLS_SCHEMA)
+
+    def episodes(self) -> pa.Table:
+        return self._read("episodes", EPISODES_SCHEMA)
+
+
+def failed(calls: pa.Table) -> pa.ChunkedArray:
+    """Calls whose result reports a failure"""
+    return pc.or_(pc.starts_with(calls["result"], "Error"), pc.starts_with(calls["result"], "You cannot move"))
+
+
+def milestone_calls(calls: pa.Table, milestone: Milestone, ok: pa.ChunkedArray = None) -> pa.Table:
+    """The calls that reach milestone; ok marks the calls that did not fail (computed if not given)"""
+    mask = None
+    if milestone.tools is not None:
+        mask = pc.is_in(calls["tool"], pa.array(milestone.tools))
+    if not milestone.on_error:
+        ok = pc.invert(failed(calls)) if ok is None else ok
+        mask = ok if mask is None else pc.and_(mask, ok)
+    # The cheap filters go first so the regular expression only sees the candidates
+    candidates = calls.filter(mask) if mask is not None else calls
+    return candidates.filter(pc.match_substring_regex(candidates[milestone.column], milestone.pattern))
+
+
+def funnel(calls: pa.Table, episodes: pa.Table, milestones: list[Milestone] = MILESTONES) -> pa.Table:
+    """
+    Per milestone: episodes that reached it, the share of all episodes, the share that
+    reached it and every earlier milestone, and the mean and median turn and tokens at
+    first reach.
+    """
+    total = max(episodes.num_rows, 1)
+    ok = pc.invert(failed(calls))
+    cumulative = None
+    rows = {name: [] for name in ("milestone", "reached", "reach_rate", "cumulative_rate",
+                                  "mean_turn", "median_turn", "mean_tokens")}
+    for milestone in milestones:
+        first = milestone_calls(calls, milestone, ok).group_by("episode").aggregate(
+            [("turn", "min"), ("tokens", "min")])
+        reached = first["episode"]
+        cumulative = reached if cumulative is None else pc.filter(cumulative, pc.is_in(cumulative, reached))
+        rows["milestone"].append(milestone.name)
+        rows["reached"].append(len(reached))
+        rows["reach_rate"].append(len(reached) / total)
+        rows["cumulative_rate"].append(len(cumulative) / total)
+        rows["mean_turn"].append(pc.mean(first["turn_min"]).as_py())
+        rows["median_turn"].append(pc.approximate_median(first["turn_min"]).as_py())
+        rows["mean_tokens"].append(pc.mean(first["tokens_min"]).as_py())
+    return pa.table(rows)
+
+
+def wasted_calls(calls: pa.Table) -> pa.Table:
+    """Calls that could not help: repeats of a read-only call, moves that were refused, unavailable actions"""
+    read_only = calls.filter(pc.is_in(calls["tool"], pa.array(READ_ONLY_TOOLS)))
+    repeats = read_only.group_by(["episode", "tool", "arguments"]).aggregate([("turn", "count")])
+    repeats = repeats.append_column("repeats", pc.subtract(repeats["turn_count"], 1))
+    repeated = repeats.group_by("tool").aggregate([("repeats", "sum")])
+    kinds = [f"repeated {tool}" for tool in repeated["tool"].to_pylist()]
+    counts = repeated["repeats_sum"].to_pylist()
+
+    moves = pc.equal(calls["tool"], "move_to")
+    kinds.append("invalid move_to")
+    counts.append(pc.sum(pc.and_(moves, failed(calls))).as_py() or 0)
+    kinds.append("unavailable action")
+    counts.append(pc.sum(pc.starts_with(calls["result"], "Error: The action")).as_py() or 0)
+    kinds.append("invalid arguments")
+    counts.append(pc.sum(pc.match_substring_regex(calls["result"], r"^Error: (the arguments|arguments must|missing required|unexpected argument|invalid value)")).as_py() or 0)
+
+    total = max(calls.num_rows, 1)
+    return pa.table({"kind": kinds, "calls": counts, "share_of_calls": [count / total for count in counts]})
+
+
+def tool_errors(calls: pa.Table) -> pa.Table:
+    """Calls, failures and failure rate per tool"""
+    table = pa.table({"tool": calls["tool"], "failed": pc.cast(failed(calls), pa.int64())})
+    stats = table.group_by("tool").aggregate([("failed", "count"), ("failed", "sum")])
+    stats = stats.rename_columns(["tool", "calls", "errors"])
+    stats = stats.append_column("error_rate", pc.divide(pc.cast(stats["errors"], pa.float64()), stats["calls"]))
+    return stats.sort_by([("calls", "descending")])
+
+
+def format_table(table: pa.Table) -> str:
+    columns = table.column_names
+    rows = [[f"{value:.3f}" if isinstance(value, float) else "" if value is None else str(value)
+             for value in row.values()] for row in table.to_pylist()]
+    widths = [max([len(name)] + [len(row[i]) for row in rows]) for i, name in enumerate(columns)]
+    lines = ["  ".join(name.ljust(width) for name, width in zip(columns, widths))]
+    lines.extend("  ".join(value.ljust(width) for value, width in zip(row, widths)) for row in rows)
+    return "\n".join(lines)
+
+
+def report(store: TraceStore) -> str:
+    calls, episodes = store.calls(), store.episodes()
+    turns = pc.mean(episodes["turns"]).as_py() or 0
+    sections = [
+        f"{episodes.num_rows} episodes, {calls.num_rows} tool calls, {turns:.1f} turns per episode",
+        "Milestones:\n" + format_table(funnel(calls, episodes)),
+        "Wasted calls:\n" + format_table(wasted_calls(calls)),
+        "Tool errors:\n" + format_table(tool_errors(calls)),
+    ]
+    return "\n\n".join(sections)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("store", help="directory of the columnar store")
+    parser.add_argument("--load", nargs="*", default=[], help="checkpoint directories or message log files to add")
+    parser.add_argument("--report", action="store_true", help="print the funnel, wasted calls and tool errors")
+    args = parser.parse_args()
+    store = TraceStore(args.store)
+    if args.load:
+        print(f"loaded {store.load(args.load)} new or changed episodes")
+    if args.report or not args.load:
+        print(report(store))
+
+
+if __name__ == "__main__":
+    main()
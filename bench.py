@@ -0,0 +1,208 @@
+"""
+Offline benchmark suite for the harness: microbenchmarks of the per-turn hot paths and
+end-to-end episodes per second with the scripted policy, against an in-process stub client
+(harness cost only) and against the fake server over loopback HTTP.
+
+Results can be saved as JSON and compared with a saved baseline; a benchmark that got
+slower than the baseline by more than --threshold is reported and the exit status is 1.
+
+    python bench.py --output baseline.json
+    python bench.py --baseline baseline.json --threshold 0.15
+"""
+import argparse
+import asyncio
+import builtins
+import json
+import platform
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from openai import AsyncAzureOpenAI
+from openai.types.chat import ChatCompletion
+
+from Agent import Agent
+from Locations import ControlRoom
+from World import create_world
+from fake_server import FakeServer, Policy, ScriptedSolver
+from runner import API_VERSION, evaluate
+from utils import function_to_schema
+
+
+class StubClient:
+    """In-process stand-in for AsyncAzureOpenAI: chat.completions.create answers from a policy without I/O"""
+
+    def __init__(self, policy: Policy):
+        self.policy = policy
+        self.requests = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, **request) -> ChatCompletion:
+        self.requests += 1
+        if request.get("stream"):
+            raise ValueError("StubClient does not stream; use the fake server")
+        message = self.policy.respond(request) if request.get("tools") else self.policy.answer(request)
+        completion_tokens = max(1, len(json.dumps(message)) // 4)
+        return ChatCompletion.model_validate({
+            "id": f"chatcmpl-stub-{self.requests}",
+            "object": "chat.completion",
+            "created": 0,
+            "model": request.get("model", "gpt-4o"),
+            "choices": [{"index": 0, "message": message,
+                         "finish_reason": "tool_calls" if message.get("tool_calls") else "stop"}],
+            "usage": {"prompt_tokens": 1000, "completion_tokens": completion_tokens,
+                      "total_tokens": 1000 + completion_tokens},
+        })
+
+    async def close(self):
+        pass
+
+
+@contextmanager
+def quiet():
+    """Silence tools that print as they run"""
+    print_ = builtins.print
+    builtins.print = lambda *args, **kwargs: None
+    try:
+        yield
+    finally:
+        builtins.print = print_
+
+
+def timeit(fn, number: int, repeat: int = 5) -> float:
+    """Best time per call in microseconds over repeat runs of number calls"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best * 1e6
+
+
+def _tool_call(name: str, args: dict):
+    return SimpleNamespace(id="call_0", function=SimpleNamespace(name=name, arguments=json.dumps(args)))
+
+
+def micro(number: int) -> dict:
+    agent = Agent(client=None, verbose=False)
+    world = create_world(agent)
+    control_room = world.locations["control_room"]
+    engine_room = world.locations["engine_room"]
+    think = _tool_call("think", {"text": "The password might be the captain's birthday."})
+    query = "SELECT * FROM crew WHERE first_name = 'Robert' AND last_name = 'Stern'"
+
+    def move():
+        agent.current_location.move_to(
+            "engine_room" if agent.current_location is control_room else "control_room")
+
+    with quiet():
+        control_room.use_database(query)  # open the database outside the timing
+        return {
+            "function_to_schema": timeit(lambda: function_to_schema(ControlRoom.use_database), number),
+            "get_available_actions": timeit(engine_room._get_available_actions, number),
+            "resolve_tool_call": timeit(lambda: agent._resolve_tool_call(think), number),
+            "use_database": timeit(lambda: control_room.use_database(query), max(1, number // 10)),
+            "move_to": timeit(move, number),
+        }
+
+
+def episodes_per_second(client_factory, episodes: int, concurrency: int, repeat: int = 3) -> float:
+    rates = []
+    for _ in range(repeat):
+        client = client_factory()
+        start = time.perf_counter()
+        results = asyncio.run(evaluate(episodes=episodes, concurrency=concurrency, client=client))
+        elapsed = time.perf_counter() - start
+        failed = [result for result in results if not result.solved or result.error]
+        if failed:
+            raise RuntimeError(f"{len(failed)} scripted episodes did not solve the puzzle: {failed[0]}")
+        rates.append(episodes / elapsed)
+    return statistics.median(rates)
+
+
+def macro(episodes: int, concurrency: int) -> dict:
+    results = {"episodes_per_second_stub": episodes_per_second(
+        lambda: StubClient(ScriptedSolver()), episodes, concurrency)}
+    with FakeServer(ScriptedSolver()) as server:
+        results["episodes_per_second_http"] = episodes_per_second(
+            lambda: AsyncAzureOpenAI(azure_endpoint=server.url, api_key="fake", api_version=API_VERSION,
+                                     max_retries=0),
+            episodes, concurrency)
+    return results
+
+
+UNITS = {
+    "function_to_schema": "us",
+    "get_available_actions": "us",
+    "resolve_tool_call": "us",
+    "use_database": "us",
+    "move_to": "us",
+    "episodes_per_second_stub": "episodes/s",
+    "episodes_per_second_http": "episodes/s",
+}
+
+
+def higher_is_better(name: str) -> bool:
+    return UNITS[name] == "episodes/s"
+
+
+def slowdown(name: str, value: float, baseline: float) -> float:
+    """Fraction by which value is worse than baseline (negative when it is better)"""
+    return baseline / value - 1 if higher_is_better(name) else value / baseline - 1
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Print results next to the baseline; returns the names of benchmarks that regressed"""
+    regressions = []
+    for name, value in results.items():
+        line = f"{name:<26} {value:12.2f} {UNITS[name]:<10}"
+        if name in baseline:
+            change = slowdown(name, value, baseline[name])
+            flag = "  REGRESSION" if change > threshold else ""
+            line += f" baseline {baseline[name]:12.2f}  {-change:+7.1%}{flag}"
+            if flag:
+                regressions.append(name)
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=2000, help="calls per microbenchmark run")
+    parser.add_argument("--episodes", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--skip-macro", action="store_true")
+    parser.add_argument("--output", help="save the results as JSON")
+    parser.add_argument("--baseline", help="compare against results saved with --output")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown, 0.1 is 10%%")
+    args = parser.parse_args()
+
+    results = micro(args.number)
+    if not args.skip_macro:
+        results.update(macro(args.episodes, args.concurrency))
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.threshold)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "units": {name: UNITS[name] for name in results},
+                "results": results,
+            }, f, indent=2)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
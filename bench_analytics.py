@@ -0,0 +1,75 @@
+"""
+Trace analytics at scale: checkpoints of --sample scripted and random episodes (stub
+client) are loaded into a TraceStore, then replicated to --episodes episodes in one
+Parquet part, which is read back and analyzed.
+
+    python bench_analytics.py --episodes 100000
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from analytics import TraceStore, funnel, tool_errors, wasted_calls
+from bench import StubClient
+from fake_server import RandomToolCaller, ScriptedSolver
+from runner import evaluate
+
+
+def replicate(table: pa.Table, copies: int) -> pa.Table:
+    """copies of table, each with its own episode ids"""
+    parts = []
+    for copy in range(copies):
+        episodes = pc.binary_join_element_wise(table["episode"], pa.scalar(str(copy)), "#")
+        parts.append(table.set_column(0, "episode", episodes))
+    return pa.concat_tables(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--episodes", type=int, default=100_000)
+    parser.add_argument("--sample", type=int, default=200, help="episodes actually run and loaded")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="analytics_bench_")
+    try:
+        runs = os.path.join(directory, "runs")
+        for name, policy in (("scripted", ScriptedSolver()), ("random", RandomToolCaller(text_probability=0.1))):
+            asyncio.run(evaluate(episodes=args.sample // 2, concurrency=10, client=StubClient(policy),
+                                 checkpoint_dir=os.path.join(runs, name), max_turns=40))
+        store = TraceStore(os.path.join(directory, "store"))
+        start = time.perf_counter()
+        loaded = store.load([runs])
+        load = time.perf_counter() - start
+        start = time.perf_counter()
+        store.load([runs])
+        reload = time.perf_counter() - start
+        print(f"load {loaded} episodes: {load / loaded * 1e6:.0f} us per episode; "
+              f"unchanged reload {reload * 1000:.1f} ms")
+
+        copies = max(1, args.episodes // loaded)
+        calls, episodes = replicate(store.calls(), copies), replicate(store.episodes(), copies)
+        path = os.path.join(directory, "large.calls.parquet")
+        pq.write_table(calls, path)
+        start = time.perf_counter()
+        calls = pq.read_table(path)
+        read = time.perf_counter() - start
+        print(f"{episodes.num_rows} episodes, {calls.num_rows} calls: read {read:.2f} s")
+        for label, analysis in (("funnel", lambda: funnel(calls, episodes)),
+                                ("wasted calls", lambda: wasted_calls(calls)),
+                                ("tool errors", lambda: tool_errors(calls))):
+            start = time.perf_counter()
+            analysis()
+            print(f"  {label:<13} {time.perf_counter() - start:6.2f} s")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Per-query latency of use_database: the old per-call CSV load into :memory: against the
+persistent, indexed CrewDatabase.
+
+    python bench_database.py            # 18-row manifest and a 1M-row manifest
+    python bench_database.py --rows 100000
+"""
+import argparse
+import csv
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import pandas as pd
+
+from database import MANIFEST_PATH, CrewDatabase
+
+QUERIES = [
+    "SELECT * FROM crew WHERE role = 'Captain' LIMIT 5",
+    "SELECT * FROM crew WHERE last_name = 'Stern' LIMIT 5",
+    "SELECT * FROM crew WHERE first_name = 'Robert' AND last_name = 'Stern' LIMIT 5",
+    "SELECT * FROM crew WHERE status = 'active' LIMIT 5",
+]
+
+
+def write_manifest(path: str, rows: int, seed: int = 0):
+    """Write a synthetic manifest with the same columns as crew_manifest.csv"""
+    rng = random.Random(seed)
+    first_names = ["Emily", "Michael", "Sophia", "James", "Aisha", "Lena", "Omar", "Yuki"]
+    last_names = ["Chen", "Okonkwo", "Patel", "Tanner", "Novak", "Reyes", "Ivanova", "Sato"]
+    roles = ["Engineer", "Medical Officer", "Navigator", "Pilot", "Technician", "Scientist"]
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        with open(MANIFEST_PATH, newline="") as manifest:
+            reader = csv.reader(manifest)
+            writer.writerow(next(reader))
+            # Keep the real crew so the puzzle queries still have an answer
+            for row in reader:
+                writer.writerow(row)
+                rows -= 1
+        for _ in range(max(rows, 0)):
+            writer.writerow([
+                rng.choice(first_names), rng.choice(last_names),
+                f"{rng.randint(1950, 2005)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                rng.choice(roles), rng.choice(["active", "retired", "deceased"]),
+                rng.randint(0, 40), "General", rng.randint(1, 5),
+            ])
+
+
+def legacy_query(csv_path: str, query: str):
+    """The previous use_database path: load the CSV into a new in-memory database per call"""
+    conn = sqlite3.connect(":memory:")
+    crew = pd.read_csv(csv_path, dtype={
+        "first_name": "string", "last_name": "string", "birthday": "string", "role": "string",
+        "status": "string", "years_of_service": "int64", "specialization": "string",
+        "clearance_level": "int64",
+    })
+    crew.to_sql("crew", conn, index=False)
+    result = pd.read_sql_query(query, conn)
+    conn.close()
+    return result
+
+
+def cached_query(database: CrewDatabase, query: str):
+    conn = database.connection()
+    with database.lock:
+        return pd.read_sql_query(query, conn)
+
+
+def measure(fn, repeat: int) -> list[float]:
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(QUERIES[i % len(QUERIES)])
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label: str, timings: list[float]):
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"  {label:<22} n={len(timings):<5} median={statistics.median(timings) * 1000:9.3f} ms  "
+          f"p95={p95 * 1000:9.3f} ms")
+
+
+def bench(csv_path: str, repeat: int, legacy_repeat: int):
+    database = CrewDatabase(csv_path)
+    start = time.perf_counter()
+    database.connection()
+    print(f"  initial build          {(time.perf_counter() - start) * 1000:9.3f} ms")
+    database.close()
+    start = time.perf_counter()
+    database.connection()
+    print(f"  reopen (no rebuild)    {(time.perf_counter() - start) * 1000:9.3f} ms")
+    report("legacy per-call load", measure(lambda q: legacy_query(csv_path, q), legacy_repeat))
+    report("persistent database", measure(lambda q: cached_query(database, q), repeat))
+    database.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="rows in the large synthetic manifest")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--legacy-repeat", type=int, default=3, help="iterations of the slow path on the large manifest")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="crew_bench_")
+    try:
+        small = os.path.join(tmp_dir, "crew_small.csv")
+        shutil.copy(MANIFEST_PATH, small)
+        print("crew_manifest.csv (18 rows)")
+        bench(small, args.repeat, args.repeat)
+
+        large = os.path.join(tmp_dir, "crew_large.csv")
+        write_manifest(large, args.rows)
+        print(f"synthetic manifest ({args.rows} rows)")
+        bench(large, args.repeat, args.legacy_repeat)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
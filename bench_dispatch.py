@@ -0,0 +1,85 @@
+"""
+Per-turn and per-tool-call harness overhead: the previous reflection-based path
+(function_to_schema for every action, a rebuilt tool_map and inspect.signature on every
+call) against lookups in the class-level action registry.
+
+    python bench_dispatch.py
+"""
+import inspect
+import json
+import time
+from types import SimpleNamespace
+
+from Agent import Agent
+from Locations import ControlRoom, EngineRoom
+from utils import function_to_schema
+
+
+class _World:
+    def __init__(self):
+        self.locations = {}
+        self.agent = None
+
+
+def _tool_call(name: str, args: dict):
+    return SimpleNamespace(id="call_0", function=SimpleNamespace(name=name, arguments=json.dumps(args)))
+
+
+def legacy_available_actions(location):
+    return [method for name, method in inspect.getmembers(location, predicate=inspect.ismethod)
+            if not name.startswith('_') and name != "available_actions"]
+
+
+def legacy_turn(agent, tool_call):
+    """Schema generation and dispatch as Agent.act did them before the registry"""
+    location = agent.current_location
+    available_actions = legacy_available_actions(location)
+    [function_to_schema(action) for action in available_actions]
+    tool_map = {
+        action.__name__: action.__get__(location, type(location))
+        for action in available_actions
+    }
+    args = json.loads(tool_call.function.arguments)
+    method = tool_map[tool_call.function.name]
+    if 'agent' in inspect.signature(method).parameters:
+        args['agent'] = agent
+    return method(**args)
+
+
+def registry_turn(agent, tool_call):
+    agent.current_location.tool_schemas
+    return agent._resolve_tool_call(tool_call)
+
+
+def measure(fn, agent, tool_call, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(agent, tool_call)
+    return (time.perf_counter() - start) / repeat
+
+
+def main(repeat: int = 20000):
+    world = _World()
+    agent = Agent(client=None)
+    world.agent = agent
+    control_room = ControlRoom(world=world)
+    world.locations = {"control_room": control_room, "engine_room": EngineRoom(world=world)}
+    agent.current_location = control_room
+    tool_call = _tool_call("think", {"text": "The password might be the captain's birthday."})
+
+    import builtins
+    print_ = builtins.print
+    builtins.print = lambda *args, **kwargs: None
+    try:
+        legacy = measure(legacy_turn, agent, tool_call, repeat)
+        registry = measure(registry_turn, agent, tool_call, repeat)
+    finally:
+        builtins.print = print_
+
+    print(f"legacy reflection path   {legacy * 1e6:8.2f} us per tool call")
+    print(f"compiled registry        {registry * 1e6:8.2f} us per tool call")
+    print(f"speedup                  {legacy / registry:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
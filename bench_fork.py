@@ -0,0 +1,70 @@
+"""
+Cost of branching an episode: World.fork() against rebuilding the world and deep-copying
+the message history, for a history of --turns tool-calling turns and --branches branches.
+
+    python bench_fork.py --turns 40 --branches 1000
+"""
+import argparse
+import copy
+import time
+import tracemalloc
+
+from Agent import Agent
+from World import create_world
+from prompts import system_prompt, goal_prompt
+
+
+def build_episode(turns: int):
+    agent = Agent(client=None, verbose=False)
+    world = create_world(agent)
+    agent.messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": goal_prompt},
+        {"role": "user", "content": agent.current_location.description},
+    ]
+    for turn in range(turns):
+        call_id = f"call_{turn}"
+        agent.messages.append({"role": "assistant", "content": None, "tool_calls": [
+            {"id": call_id, "type": "function", "function": {"name": "think", "arguments": '{"text": "plan"}'}},
+        ]})
+        agent.messages.append({"role": "tool", "tool_call_id": call_id, "content": f"Turn {turn}: " + "x" * 400})
+    return world
+
+
+def rebuild(world):
+    agent = Agent(client=None, verbose=False)
+    branch = create_world(agent)
+    agent.messages = copy.deepcopy(list(world.agent.messages))
+    for name, location in world.locations.items():
+        branch.locations[name]._restore(location._snapshot())
+    agent.current_location = branch.locations[world.agent.current_location.name]
+    return branch
+
+
+def measure(label: str, make_branch, world, branches: int):
+    tracemalloc.start()
+    start = time.perf_counter()
+    forks = [make_branch(world) for _ in range(branches)]
+    # Every branch diverges by one message
+    for branch in forks:
+        branch.agent.messages.append({"role": "user", "content": "Try something else."})
+    elapsed = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{label:<8} {elapsed / branches * 1e6:9.1f} us per branch, {memory / branches / 1024:8.1f} KiB per branch")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--branches", type=int, default=1000)
+    args = parser.parse_args()
+
+    world = build_episode(args.turns)
+    print(f"{len(world.agent.messages)} messages, {world.agent.messages.total_tokens} tokens")
+    measure("rebuild", rebuild, world, args.branches)
+    measure("fork", lambda world: world.fork(), world, args.branches)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Generated worlds at scale: construction time, move_to latency on a random walk, distance
+precomputation and shortest paths, for worlds of --sizes locations.
+
+    python bench_graph.py --sizes 1000 10000 100000 --moves 100000
+"""
+import argparse
+import random
+import time
+
+from Agent import Agent
+from World import create_large_world
+
+
+def bench(size: int, moves: int, seed: int):
+    agent = Agent(client=None, verbose=False)
+    start = time.perf_counter()
+    world = create_large_world(agent, size, seed=seed)
+    build = time.perf_counter() - start
+
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    for _ in range(moves):
+        location = agent.current_location
+        location.move_to(rng.choice(location.adjacent_locations))
+    walk = time.perf_counter() - start
+
+    sources = rng.sample(list(world.locations), 10)
+    start = time.perf_counter()
+    world.graph._distances.clear()
+    world.graph.precompute(sources)
+    distances = (time.perf_counter() - start) / len(sources)
+
+    start = time.perf_counter()
+    path = world.graph.shortest_path("control_room", "engine_room")
+    shortest = time.perf_counter() - start
+
+    start = time.perf_counter()
+    world.fork()
+    fork = time.perf_counter() - start
+
+    print(f"{size:>8} locations: build {build * 1000:8.1f} ms | move_to {walk / moves * 1e6:5.2f} us | "
+          f"BFS {distances * 1000:7.2f} ms per source | shortest path ({len(path) - 1} moves) "
+          f"{shortest * 1000:6.2f} ms | fork {fork * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--moves", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for size in args.sizes:
+        bench(size, args.moves, args.seed)
+
+
+if __name__ == "__main__":
+    main()
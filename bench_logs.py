@@ -0,0 +1,87 @@
+"""
+LogStore at scale: parse time, index memory and query latency for a generated navigation
+log of --lines lines, against reading and scanning the whole file as a string.
+
+    python bench_logs.py --lines 2000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import sys
+import time
+
+from logs import LogStore
+
+MESSAGES = [
+    ("INFO", "Gyroscope calibration verified. [Module ID: GYRO-{:02d}]"),
+    ("INFO", "Fuel consumption nominal. [Injector ID: PDRIVE-{}]"),
+    ("INFO", "Celestial reference beacon signal acquired. [Beacon ID: CRB-{}]"),
+    ("DEBUG", "Running diagnostics on ACCEL-{:02d}..."),
+    ("WARNING", "Component drift detected in sensor array. [Component ID: SA-{}X]"),
+    ("ERROR", "Navigation relay NR-{}X non-responsive. [Critical Module]"),
+]
+WEIGHTS = [40, 30, 20, 8, 1.5, 0.5]
+
+
+def write_log(path: str, lines: int, seed: int = 0):
+    rng = random.Random(seed)
+    seconds = 0
+    with open(path, "w") as f:
+        f.write("[LOG START] [NAV-SYSTEM] [Timestamp: 2235-06-14 00:00:00 UTC]\n")
+        written = 1
+        while written < lines:
+            seconds += rng.randint(1, 5)
+            f.write(f"[Timestamp: 2235-06-{14 + seconds // 86400:02d} "
+                    f"{seconds // 3600 % 24:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d} UTC]\n")
+            for level, message in rng.choices(MESSAGES, WEIGHTS, k=4):
+                f.write(f"{level}: {message.format(rng.randint(1, 99))}\n")
+            written += 5
+        f.write("[LOG END]\n")
+
+
+def timed(label: str, function, repeat: int = 5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    print(f"  {label:<38} {(time.perf_counter() - start) / repeat * 1000:9.2f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "navigation.log")
+    write_log(path, args.lines)
+    print(f"{args.lines} lines, {os.path.getsize(path) / 2 ** 20:.0f} MiB")
+
+    start = time.perf_counter()
+    store = LogStore(path)
+    parse = time.perf_counter() - start
+    indexes = [*store.by_level.values(), *store.by_component.values()]
+    memory = sum(sys.getsizeof(column) for column in (
+        store.starts, store.ends, store.levels, store.times, store.subsystems, store.components, *indexes))
+    print(f"  {'parse and index':<38} {parse * 1000:9.2f} ms, {memory / 2 ** 20:.1f} MiB "
+          f"({memory / len(store):.0f} bytes per entry)")
+
+    def read_whole_file():
+        with open(path) as f:
+            return [line for line in f.read().splitlines() if line.startswith("ERROR")]
+
+    timed("old way: read file, scan for ERROR", read_whole_file, repeat=1)
+    timed("summary", store.summary)
+    timed("level=ERROR, page 1", lambda: store.query(level="ERROR"))
+    timed("component=NR-47X", lambda: store.query(component="NR-47X"))
+    timed("since/until one hour", lambda: store.query(since="2235-06-14 10:00:00", until="2235-06-14 11:00:00"))
+    timed("level=WARNING and one hour", lambda: store.query(level="WARNING", since="10:00", until="11:00"))
+    timed("contains 'drift' (whole file)", lambda: store.query(contains="drift"), repeat=1)
+    store.close()
+    os.remove(path)
+    os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Resident memory of --episodes finished episodes kept in memory at once, with the message
+history stored the old way (SDK ChatCompletionMessage objects and dicts) and as
+messages.Message objects, with the prompts and the location description interned as
+runner.build_world does.
+
+The history is recorded from one scripted episode against the local fake server. Every
+episode then gets its own copy, parsed from JSON as the SDK and the tools would produce it,
+so repeated content arrives as separate string objects, as it does in a real run.
+
+    python bench_memory.py --episodes 10000
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from openai import AzureOpenAI
+from openai.types.chat import ChatCompletionMessage
+
+from Agent import Agent
+from World import create_world
+from fake_server import FakeServer, ScriptedSolver
+from messages import intern_content, to_message
+from prompts import system_prompt, goal_prompt
+from runner import API_VERSION
+
+
+def record_episode() -> list[str]:
+    with FakeServer(ScriptedSolver()) as server:
+        client = AzureOpenAI(azure_endpoint=server.url, api_key="fake", api_version=API_VERSION)
+        agent = Agent(client, verbose=False)
+        world = create_world(agent)
+        agent.messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": goal_prompt},
+            {"role": "user", "content": agent.current_location.description},
+        ]
+        while not world.check_for_completion():
+            agent.act()
+    return [json.dumps(message) for message in agent.messages.to_dicts()]
+
+
+def legacy_episode(raw: list[str]) -> list:
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": goal_prompt},
+    ]
+    for line in raw[2:]:
+        message = json.loads(line)
+        if message["role"] == "assistant":
+            message = ChatCompletionMessage.model_validate(message)
+        messages.append(message)
+    return messages
+
+
+def compact_episode(raw: list[str]) -> list:
+    messages = [
+        to_message({"role": "system", "content": system_prompt}),
+        to_message({"role": "user", "content": goal_prompt}),
+        to_message({"role": "user", "content": intern_content(json.loads(raw[2])["content"])}),
+    ]
+    messages.extend(to_message(json.loads(line)) for line in raw[3:])
+    return messages
+
+
+def measure(label: str, build, raw: list[str], episodes: int):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    resident = [build(raw) for _ in range(episodes)]
+    elapsed = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{label:<8} {memory / 2 ** 20:8.1f} MiB for {len(resident)} episodes "
+          f"({memory / episodes / 1024:5.1f} KiB each), built in {elapsed:.1f} s")
+    return memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--episodes", type=int, default=10000)
+    args = parser.parse_args()
+
+    raw = record_episode()
+    print(f"{len(raw)} messages per episode, {sum(map(len, raw))} bytes as JSON")
+    before = measure("before", legacy_episode, raw, args.episodes)
+    after = measure("after", compact_episode, raw, args.episodes)
+    print(f"{before / after:.1f}x less memory")
+
+
+if __name__ == "__main__":
+    main()
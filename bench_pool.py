@@ -0,0 +1,86 @@
+"""
+Episodes per second with worlds built for every episode against worlds taken from a
+WorldPool and reset in place, using the in-process stub client and the scripted policy
+(random tool calls on generated worlds, where the scripted path does not apply). It also
+times building one world against resetting one.
+
+Pooling only helps where building a world is a noticeable share of an episode, i.e. on
+large generated worlds; on the two-room ship both take microseconds and the episode rates
+are the same within noise.
+
+    python bench_pool.py --episodes 500 --concurrency 10 --world-sizes 0 10000
+"""
+import argparse
+import asyncio
+import time
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from bench import StubClient
+from fake_server import RandomToolCaller, ScriptedSolver
+from pool import WorldPool
+from runner import CompletionCaller, EpisodeConfig, build_world, run_episode
+
+
+async def run(episodes: int, concurrency: int, config: EpisodeConfig, pooled: bool) -> tuple[float, int]:
+    policy = RandomToolCaller() if config.world_size else ScriptedSolver()
+    completions = CompletionCaller(StubClient(policy))
+    semaphore = asyncio.Semaphore(concurrency)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pool = WorldPool(partial(build_world, completions, config, executor)) if pooled else None
+
+        async def bounded(episode_id: int):
+            async with semaphore:
+                return await run_episode(completions, episode_id, config, executor, pool=pool)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(bounded(i) for i in range(episodes)))
+        elapsed = time.perf_counter() - start
+    errors = [result.error for result in results if result.error]
+    if errors:
+        raise RuntimeError(errors[0])
+    return episodes / elapsed, pool.created if pool else episodes
+
+
+def world_costs(config: EpisodeConfig, number: int) -> tuple[float, float]:
+    """Microseconds to build a world and to reset one after a short walk"""
+    completions = CompletionCaller(StubClient(ScriptedSolver()))
+    build = partial(build_world, completions, config)
+    pool = WorldPool(build)
+    world = pool.acquire()
+    start = world.agent.current_location
+
+    def episode():
+        world.agent.messages.append({"role": "assistant", "content": "Looking around."})
+        world.move_agent(start.adjacent_locations[0])
+        world.move_agent(start.name)
+        pool.release(world)
+        pool.acquire()
+
+    build_us = min(timeit.repeat(build, number=number, repeat=3)) / number * 1e6
+    reset_us = min(timeit.repeat(episode, number=number, repeat=3)) / number * 1e6
+    return build_us, reset_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--episodes", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--world-sizes", type=int, nargs="+", default=[0, 10000],
+                        help="0 is the two-room ship")
+    parser.add_argument("--max-turns", type=int, default=20)
+    args = parser.parse_args()
+    for size in args.world_sizes:
+        config = EpisodeConfig(world_size=size or None, max_turns=args.max_turns)
+        label = f"{size} locations" if size else "two-room ship"
+        build_us, reset_us = world_costs(config, max(1, 2000 // max(size, 1)))
+        print(f"{label:<16} build a world {build_us:10.1f} us, reset one {reset_us:8.1f} us")
+        for pooled in (False, True):
+            rate, built = asyncio.run(run(args.episodes, args.concurrency, config, pooled))
+            print(f"{label:<16} {'pooled' if pooled else 'fresh':<7} {rate:9.1f} episodes/s "
+                  f"({built} worlds built for {args.episodes} episodes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Cold start cost: import time of the agent modules and time from process start to the first
+chat completion request, measured in fresh interpreters against the local fake server.
+
+Import cost is read from `python -X importtime`. Time to first request is the wall clock from
+spawning `python runner.py --episodes 1` until the fake server receives its first request.
+Limits make the script fail in CI when startup regresses:
+
+    python bench_startup.py --runs 5
+    python bench_startup.py --max-import-ms Locations=150 --max-first-request-ms 2500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from fake_server import FakeServer, ScriptedSolver
+
+MODULES = ["Locations", "Agent", "runner"]
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def import_time(module: str) -> tuple[float, list[tuple[str, float]]]:
+    """Cumulative import time of module in seconds, and the slowest packages it pulled in"""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=HERE, capture_output=True, text=True, check=True,
+    ).stderr
+    total, packages, children = 0.0, [], []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        seconds = int(cumulative) / 1e6
+        # Children are listed before their parent, one level deeper (three spaces); top-level
+        # lines that are not the module, such as site, reset the direct imports seen so far
+        if name.startswith("   ") and not name.startswith("    "):
+            children.append((name.strip(), seconds))
+        elif not name.startswith("  "):
+            if name.strip() == module:
+                total, packages = seconds, children
+            children = []
+    return total, sorted(packages, key=lambda package: package[1], reverse=True)[:3]
+
+
+def time_to_first_request(server: FakeServer, timeout: float = 60.0) -> float:
+    env = {**os.environ, "AZURE_OPENAI_ENDPOINT": server.url, "AZURE_OPENAI_API_KEY": "fake"}
+    seen = server.requests
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "runner.py", "--episodes", "1", "--concurrency", "1"],
+        cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while server.requests == seen:
+            if process.poll() is not None or time.perf_counter() - start > timeout:
+                raise RuntimeError("runner.py exited or timed out before sending a request")
+            time.sleep(0.001)
+        return time.perf_counter() - start
+    finally:
+        process.wait(timeout=timeout)
+
+
+def parse_limits(values: list[str]) -> dict[str, float]:
+    limits = {}
+    for value in values:
+        module, _, milliseconds = value.partition("=")
+        limits[module] = float(milliseconds) / 1000
+    return limits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--max-import-ms", action="append", default=[], metavar="MODULE=MS",
+                        help="fail if the median import time of MODULE exceeds MS")
+    parser.add_argument("--max-first-request-ms", type=float, default=None,
+                        help="fail if the median time to first request exceeds this")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    limits = parse_limits(args.max_import_ms)
+    results = {"import": {}, "first_request": None}
+    for module in dict.fromkeys(MODULES + list(limits)):
+        runs = [import_time(module) for _ in range(args.runs)]
+        results["import"][module] = {
+            "median": statistics.median(total for total, _ in runs),
+            "slowest": runs[-1][1],
+        }
+    with FakeServer(ScriptedSolver()) as server:
+        results["first_request"] = statistics.median(time_to_first_request(server) for _ in range(args.runs))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for module, result in results["import"].items():
+            slowest = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in result["slowest"])
+            print(f"import {module:<10} {result['median'] * 1000:7.1f} ms  (slowest: {slowest})")
+        print(f"time to first request {results['first_request'] * 1000:7.1f} ms")
+
+    failures = []
+    for module, limit in limits.items():
+        if results["import"][module]["median"] > limit:
+            failures.append(f"import {module} took longer than {limit * 1000:.0f} ms")
+    if args.max_first_request_ms is not None and results["first_request"] * 1000 > args.max_first_request_ms:
+        failures.append(f"first request took longer than {args.max_first_request_ms:.0f} ms")
+    for failure in failures:
+        print("FAIL:", failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
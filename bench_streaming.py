@@ -0,0 +1,77 @@
+"""
+Time to first action per turn, streaming against non-streaming, on the local fake server.
+
+The fake server streams at a fixed token rate. Each turn the policy sends a long think()
+followed by the scripted action, so streaming can start the first tool call while the
+rest of the message is still arriving.
+
+    python bench_streaming.py --latency 0.2 --seconds-per-token 0.002
+"""
+import argparse
+import json
+import statistics
+import time
+
+from openai import AzureOpenAI
+
+from Agent import Agent
+from World import create_world
+from fake_server import FakeServer, ScriptedSolver
+from prompts import system_prompt, goal_prompt
+from runner import API_VERSION
+
+PLAN = ("Let me review what I know so far, which locations I have seen, which tools each of them offers, "
+        "and which pieces of information are still missing before I can activate the navigation system. ") * 3
+
+
+class ThinkThenAct(ScriptedSolver):
+    """The scripted solution path, with a long think() call in front of every action"""
+
+    def respond(self, request: dict) -> dict:
+        message = super().respond(request)
+        if message.get("tool_calls"):
+            step = message["tool_calls"][0]["id"].rsplit("_", 1)[1]
+            think = {"id": f"think_{step}", "type": "function",
+                     "function": {"name": "think", "arguments": json.dumps({"text": PLAN})}}
+            message["tool_calls"].insert(0, think)
+        return message
+
+
+def run(client: AzureOpenAI, stream: bool) -> tuple[list[float], list[float], bool]:
+    agent = Agent(client, verbose=False, stream=stream)
+    world = create_world(agent)
+    agent.messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": goal_prompt},
+        {"role": "user", "content": agent.current_location.description},
+    ]
+    first_action, turn = [], []
+    while not world.check_for_completion():
+        start = time.perf_counter()
+        message = agent.act()
+        turn.append(time.perf_counter() - start)
+        if not message.tool_calls:
+            break
+        first_action.append(agent.time_to_first_action)
+    return first_action, turn, world.check_for_completion()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first byte")
+    parser.add_argument("--seconds-per-token", type=float, default=0.002)
+    args = parser.parse_args()
+
+    server = FakeServer(ThinkThenAct(), latency=args.latency, seconds_per_token=args.seconds_per_token)
+    with server:
+        client = AzureOpenAI(azure_endpoint=server.url, api_key="fake", api_version=API_VERSION)
+        for stream in (False, True):
+            first_action, turn, solved = run(client, stream)
+            label = "streaming" if stream else "non-streaming"
+            print(f"{label:<14} time to first action: median {statistics.median(first_action) * 1000:7.1f} ms, "
+                  f"max {max(first_action) * 1000:7.1f} ms | turn: median {statistics.median(turn) * 1000:7.1f} ms "
+                  f"| solved={solved}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Opt-in on-disk cache of chat completions for deterministic requests.
+
+A request is cacheable when it is not streamed and its sampling is fixed: temperature 0 or
+a seed. The key is a SHA-256 of the canonical JSON of everything that affects the answer
+(model, messages, tools, sampling parameters). Entries live in a SQLite database in WAL
+mode, so several processes can share one cache file, and the least recently used entries
+are evicted once the stored responses exceed max_bytes. The bound is checked on every store
+and when the cache is opened, since another process may have filled the file with a larger
+budget. A response larger than max_bytes on its own is not stored.
+
+    cache = CompletionCache("completions.db")
+    client = cached_client(AzureOpenAI(...), cache)   # or an AsyncAzureOpenAI
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+import openai
+from openai.types.chat import ChatCompletion
+
+# Request options that change how a request is sent, not what the model answers
+TRANSPORT_OPTIONS = {"stream", "stream_options", "timeout", "extra_headers", "extra_query", "extra_body"}
+EVICT_BATCH = 64
+BUSY_TIMEOUT_MS = 10_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS completions_last_used ON completions (last_used);
+CREATE TABLE IF NOT EXISTS cache_size (total INTEGER NOT NULL);
+INSERT INTO cache_size SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM cache_size);
+CREATE TRIGGER IF NOT EXISTS completions_insert AFTER INSERT ON completions
+    BEGIN UPDATE cache_size SET total = total + NEW.size; END;
+CREATE TRIGGER IF NOT EXISTS completions_delete AFTER DELETE ON completions
+    BEGIN UPDATE cache_size SET total = total - OLD.size; END;
+"""
+
+
+def is_cacheable(request: dict) -> bool:
+    if request.get("stream"):
+        return False
+    return request.get("temperature") == 0 or request.get("seed") is not None
+
+
+def _jsonable(value):
+    if hasattr(value, "model_dump"):
+        return value.model_dump(exclude_none=True)
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    return str(value)
+
+
+def request_key(request: dict) -> str:
+    """Canonical hash of the parts of a request that determine the completion"""
+    canonical = {name: value for name, value in request.items() if name not in TRANSPORT_OPTIONS}
+    text = json.dumps(canonical, sort_keys=True, separators=(",", ":"), default=_jsonable)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class CompletionCache:
+    """
+    Size-bounded LRU store of completions keyed by request_key(). Cached responses come
+    back without usage, since they spend no tokens. hits, misses, stores and evictions
+    count this process's activity.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        # One transaction, so processes opening a new cache file at the same time do not race
+        self._conn.executescript(f"BEGIN IMMEDIATE; {SCHEMA}")
+        try:
+            self._evict()
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            self._conn.close()
+            raise
+
+    def get(self, request: dict) -> ChatCompletion | None:
+        """The cached completion for a request, or None on a miss or if it is not cacheable"""
+        if not is_cacheable(request):
+            return None
+        key = request_key(request)
+        with self.lock:
+            row = self._conn.execute("SELECT response FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (time.time(), key))
+        return ChatCompletion.model_validate_json(row[0])
+
+    def put(self, request: dict, response: ChatCompletion):
+        if not is_cacheable(request) or not isinstance(response, ChatCompletion):
+            return
+        key = request_key(request)
+        data = response.model_copy(update={"usage": None}).model_dump_json(exclude_unset=True)
+        if len(data) > self.max_bytes:
+            return  # Storing it would evict every other entry and still exceed the budget
+        with self.lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self._conn.execute("INSERT INTO completions VALUES (?, ?, ?, ?)",
+                                   (key, data, len(data), time.time()))
+                self.stores += 1
+                self._evict()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self):
+        while self._conn.execute("SELECT total FROM cache_size").fetchone()[0] > self.max_bytes:
+            deleted = self._conn.execute(
+                "DELETE FROM completions WHERE key IN "
+                "(SELECT key FROM completions ORDER BY last_used LIMIT ?)", (EVICT_BATCH,)).rowcount
+            if not deleted:
+                break
+            self.evictions += deleted
+
+    def stats(self) -> dict:
+        with self.lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), (SELECT total FROM cache_size) FROM completions").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        with self.lock:
+            self._conn.close()
+
+
+class _Completions:
+    def __init__(self, completions, cache: CompletionCache):
+        self._completions = completions
+        self._cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self._completions, name)
+
+    def create(self, **request):
+        response = self._cache.get(request)
+        if response is None:
+            response = self._completions.create(**request)
+            self._cache.put(request, response)
+        return response
+
+
+class _AsyncCompletions(_Completions):
+    # Lookups and stores can wait on other processes' write locks, so they run off the event loop
+    async def create(self, **request):
+        if not is_cacheable(request):
+            return await self._completions.create(**request)
+        response = await asyncio.to_thread(self._cache.get, request)
+        if response is None:
+            response = await self._completions.create(**request)
+            await asyncio.to_thread(self._cache.put, request, response)
+        return response
+
+
+class _Chat:
+    def __init__(self, chat, completions: _Completions):
+        self._chat = chat
+        self.completions = completions
+
+    def __getattr__(self, name):
+        return getattr(self._chat, name)
+
+
+class CachedClient:
+    """
+    Wraps an OpenAI client (sync or async) so chat.completions.create() is answered from the
+    cache when possible. Everything else is passed through to the client.
+    """
+
+    def __init__(self, client, cache: CompletionCache):
+        self._client = client
+        self.cache = cache
+        completions_type = _AsyncCompletions if isinstance(client, openai.AsyncOpenAI) else _Completions
+        self.chat = _Chat(client.chat, completions_type(client.chat.completions, cache))
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def cached_client(client, cache: CompletionCache = None):
+    """Put cache in front of client; a None cache returns the client unchanged"""
+    return client if cache is None else CachedClient(client, cache)
@@ -0,0 +1,189 @@
+"""
+Append-only checkpoints for episodes, and a manifest of finished episodes for batch runs.
+
+Each episode gets a JSON lines file with one record per completed turn. A record holds what
+the turn added: the messages since the previous record (all of them after the context was
+compacted), the locations the agent has been in since then whose state flags changed, and
+the path walked since then, plus the nudge count and the agent's location, inventory and
+token counts. Only the first record holds every location, so recording a turn does not
+depend on the size of the world or the length of the history. A line is written with one
+write() and fsync'd, and a torn last line is cut off on load, so a crash loses at most the
+turn in progress.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+
+from Agent import AgentState
+from World import World, WorldState
+from context import Context
+from messages import to_message
+
+
+def _message_record(message) -> dict:
+    record = message.to_dict()
+    if not message.in_transcript:
+        record["in_transcript"] = False
+    return record
+
+
+def _message_from_record(record: dict):
+    message = to_message(record)
+    message.in_transcript = record.get("in_transcript", True)
+    return message
+
+
+def read_jsonl(path: str) -> list[dict]:
+    """Records of a JSON lines file, skipping a last line left incomplete by a crash"""
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                if line.endswith("\n"):
+                    raise
+    return records
+
+
+def repair_jsonl(path: str):
+    """Cut a last line left incomplete by a crash, so the next append starts on a line of its own"""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        if not size:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # Search back for the end of the last complete line, a chunk at a time
+        end, position = -1, size
+        while end < 0 and position > 0:
+            position = max(0, position - (1 << 16))
+            f.seek(position)
+            end = f.read(size - position).rfind(b"\n")
+        f.truncate(position + end + 1 if end >= 0 else 0)
+
+
+def append_jsonl(path: str, record: dict, fsync: bool = True):
+    line = json.dumps(record, separators=(",", ":")) + "\n"
+    with open(path, "a") as f:
+        f.write(line)
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+
+
+class EpisodeCheckpoint:
+    """
+    Checkpoint log of one episode. record() captures the world after a turn and must run
+    between turns; append() does the file I/O and may run on another thread.
+    """
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self._written = 0
+        self._compactions = None
+        self._locations = None
+        self._path_length = 0
+        self._location = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def record(self, world: World, turns: int) -> dict:
+        agent = world.agent
+        messages = agent.messages
+        reset = messages.compactions != self._compactions
+        start = 0 if reset else self._written
+        self._written, self._compactions = len(messages), messages.compactions
+        if self._locations is None:
+            self._locations, names = {}, world.locations
+        else:
+            # Tools only change the location they run in
+            names = set(world.path[self._path_length:])
+            if self._location is not None:
+                names.add(self._location)
+        locations = {}
+        for name in names:
+            state = world.locations[name]._snapshot()
+            if self._locations.get(name) != state:
+                locations[name] = self._locations[name] = state
+        path = world.path[self._path_length:]
+        self._path_length = len(world.path)
+        self._location = agent.current_location.name if agent.current_location else None
+        return {
+            "turn": turns,
+            "reset": reset,
+            "messages": [_message_record(message) for message in messages.tail(start)],
+            "locations": locations,
+            "nudges": world.number_of_nudges,
+            "path": path,
+            "agent": {
+                "location": self._location,
+                "inventory": list(agent.inventory),
+                "prompt_tokens": agent.prompt_tokens,
+                "completion_tokens": agent.completion_tokens,
+            },
+        }
+
+    def append(self, record: dict):
+        append_jsonl(self.path, record, self.fsync)
+
+    def save(self, world: World, turns: int):
+        self.append(self.record(world, turns))
+
+    def restore(self, world: World) -> int:
+        """Put world (built the same way as the checkpointed one) into the last saved state; returns its turn"""
+        repair_jsonl(self.path)
+        records = read_jsonl(self.path)
+        if not records:
+            return 0
+        messages, locations, path = [], {}, []
+        for record in records:
+            if record["reset"]:
+                messages = []
+            messages.extend(record["messages"])
+            locations.update((name, tuple(state)) for name, state in record["locations"].items())
+            path.extend(record["path"])
+        last = records[-1]
+        agent = last["agent"]
+        context = Context([_message_from_record(message) for message in messages], budget=world.agent.token_budget)
+        world.restore(WorldState(
+            locations=locations,
+            number_of_nudges=last["nudges"],
+            path=tuple(path),
+            agent=AgentState(
+                location=agent["location"],
+                inventory=tuple(agent["inventory"]),
+                messages=context,
+                prompt_tokens=agent["prompt_tokens"],
+                completion_tokens=agent["completion_tokens"],
+            ),
+        ))
+        self._written, self._compactions = len(world.agent.messages), world.agent.messages.compactions
+        self._locations = locations
+        self._path_length, self._location = len(path), agent["location"]
+        return last["turn"]
+
+
+class RunManifest:
+    """Results of the finished episodes of a batch run, so a rerun can skip them"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def completed(self) -> dict[int, dict]:
+        repair_jsonl(self.path)
+        return {record["episode_id"]: record for record in read_jsonl(self.path)}
+
+    def add(self, result: dict):
+        with self.lock:
+            append_jsonl(self.path, result)
@@ -0,0 +1,251 @@
+"""
+Token-budgeted message history for Agent.messages.
+
+Tokens are counted once per message as it is appended. When the running total exceeds the
+budget the history is compacted, oldest first:
+1. older copies of identical tool outputs are replaced by a short marker,
+2. stale tool results outside the recent window are elided,
+3. older turns are folded into a single summary message.
+Assistant messages with tool_calls are only ever removed together with their tool results,
+so the history sent to the API stays valid.
+"""
+from __future__ import annotations
+
+from itertools import chain
+
+from messages import Message, to_message
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:  # tiktoken is optional; fall back to ~4 characters per token
+    _encoding = None
+
+MESSAGE_OVERHEAD = 4
+ELIDE_MIN_TOKENS = 64
+SUMMARY_LINE_CHARS = 160
+SUMMARY_MAX_LINES = 40
+SUMMARY_PREFIX = "Summary of earlier turns:\n"
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def message_tokens(message: Message) -> int:
+    tokens = MESSAGE_OVERHEAD + count_tokens(message.content)
+    for tool_call in message.tool_calls or ():
+        tokens += count_tokens(tool_call.function.name) + count_tokens(tool_call.function.arguments)
+    return tokens
+
+
+def _first_line(text: str) -> str:
+    line = (text or "").strip().split("\n", 1)[0]
+    return line if len(line) <= SUMMARY_LINE_CHARS else line[:SUMMARY_LINE_CHARS] + "..."
+
+
+class Context:
+    """
+    The message list of one episode. Messages are stored as messages.Message; append()
+    converts dicts and SDK messages, and to_dicts() gives the wire format. Behaves like a
+    list (iteration, len, indexing) and keeps per-message token counts and the transcript used by
+    ask_artificial_intelligence up to date as messages are appended.
+
+    budget is the token limit (None disables compaction), keep_recent the number of
+    trailing messages that are never compacted, and compact_to the fraction of the budget
+    to compact down to, so compaction does not run again on every append.
+    """
+
+    def __init__(self, messages=(), budget: int = None, keep_recent: int = 8, compact_to: float = 0.75):
+        self.budget = budget
+        self.keep_recent = keep_recent
+        self.compact_to = compact_to
+        self.total_tokens = 0
+        self.compactions = 0
+        # Messages shared with forks are frozen into an immutable prefix; appends go to the tail
+        self._prefix: tuple = ()
+        self._prefix_tokens: tuple = ()
+        self._messages = []
+        self._tokens = []
+        self._transcript_parts = []
+        self._transcript: str = None
+        self.extend(messages)
+
+    def __iter__(self):
+        if not self._prefix:
+            return iter(self._messages)
+        return chain(self._prefix, self._messages)
+
+    def __len__(self) -> int:
+        return len(self._prefix) + len(self._messages)
+
+    def __getitem__(self, index):
+        if not self._prefix:
+            return self._messages[index]
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += len(self)
+        if 0 <= index < len(self._prefix):
+            return self._prefix[index]
+        return self._messages[index - len(self._prefix)]
+
+    def __repr__(self) -> str:
+        return f"Context({len(self)} messages, {self.total_tokens} tokens)"
+
+    def tail(self, start: int) -> list:
+        """Messages from index start on, without walking the shared prefix before it"""
+        shared = len(self._prefix)
+        if start >= shared:
+            return self._messages[start - shared:]
+        return [*self._prefix[start:], *self._messages]
+
+    def append(self, message):
+        message = to_message(message)
+        tokens = message_tokens(message)
+        self._messages.append(message)
+        self._tokens.append(tokens)
+        self.total_tokens += tokens
+        if message.in_transcript and message.content is not None:
+            self._transcript_parts.append(message.content)
+        if self.budget is not None and self.total_tokens > self.budget:
+            self.compact()
+
+    def extend(self, messages):
+        for message in messages:
+            self.append(message)
+
+    def transcript(self) -> str:
+        """Contents of all prompts, tool results and nudges so far, joined incrementally"""
+        if self._transcript_parts:
+            new = "\n".join(self._transcript_parts)
+            self._transcript = new if self._transcript is None else f"{self._transcript}\n{new}"
+            self._transcript_parts = []
+        return self._transcript or ""
+
+    def to_dicts(self) -> list[dict]:
+        """The history in the API wire format"""
+        return [message.to_dict() for message in self]
+
+    def fork(self) -> Context:
+        """
+        A branch of this history. Both share everything so far as an immutable prefix and
+        append to their own tails, so a fork costs memory for the messages it adds and not
+        for the whole history. Only compacting a branch copies the prefix into it.
+        """
+        self._freeze()
+        self.transcript()
+        branch = Context.__new__(Context)
+        branch.__dict__.update(self.__dict__)
+        branch._messages, branch._tokens, branch._transcript_parts = [], [], []
+        return branch
+
+    def _freeze(self):
+        if self._messages:
+            self._prefix += tuple(self._messages)
+            self._prefix_tokens += tuple(self._tokens)
+            self._messages, self._tokens = [], []
+
+    def _thaw(self):
+        # Compaction rewrites messages in place, so it works on a private copy of the prefix
+        if self._prefix:
+            self._messages = [*self._prefix, *self._messages]
+            self._tokens = [*self._prefix_tokens, *self._tokens]
+            self._prefix, self._prefix_tokens = (), ()
+
+    def _replace(self, index: int, message):
+        tokens = message_tokens(message)
+        self.total_tokens += tokens - self._tokens[index]
+        self._messages[index] = message
+        self._tokens[index] = tokens
+
+    def _head_length(self) -> int:
+        # Leading system/user prompts set up the task and are never compacted
+        for index, message in enumerate(self._messages):
+            if message.role == "assistant":
+                return index
+        return len(self._messages)
+
+    def _tail_start(self) -> int:
+        start = max(self._head_length(), len(self._messages) - self.keep_recent)
+        # Never split an assistant message from its tool results
+        while 0 < start < len(self._messages) and self._messages[start].role == "tool":
+            start -= 1
+        return start
+
+    def _tool_names(self) -> dict:
+        names = {}
+        for message in self._messages:
+            for tool_call in message.tool_calls or ():
+                names[tool_call.id] = tool_call.function.name
+        return names
+
+    def compact(self):
+        self._thaw()
+        target = int(self.budget * self.compact_to)
+        head = self._head_length()
+        if head >= len(self._messages):
+            return  # Only the opening prompts so far: nothing to compact
+        tail = self._tail_start()
+        self.compactions += 1
+
+        # 1. Older copies of identical tool outputs
+        latest = {}
+        for index in range(len(self._messages) - 1, head - 1, -1):
+            message = self._messages[index]
+            if message.role != "tool" or self._tokens[index] < ELIDE_MIN_TOKENS:
+                continue
+            if message.content in latest and index < tail:
+                self._replace(index, message.replace("[Identical to a later tool result]"))
+            latest.setdefault(message.content, index)
+        if self.total_tokens <= target:
+            return
+
+        # 2. Stale tool results outside the recent window
+        names = self._tool_names()
+        for index in range(head, tail):
+            message = self._messages[index]
+            if message.role == "tool" and self._tokens[index] >= ELIDE_MIN_TOKENS:
+                name = names.get(message.tool_call_id, "tool")
+                self._replace(index, message.replace(
+                    f"[Elided {name} output ({self._tokens[index]} tokens): {_first_line(message.content)}]"))
+                if self.total_tokens <= target:
+                    return
+
+        # 3. Fold the oldest turns into one summary message
+        self._summarize(head, tail, target)
+
+    def _summarize(self, head: int, tail: int, target: int):
+        end = head
+        excess = self.total_tokens - target
+        folded = 0
+        while end < tail and folded < excess:
+            folded += self._tokens[end]
+            end += 1
+        while end < tail and self._messages[end].role == "tool":
+            end += 1
+        if end <= head:
+            return
+        names = self._tool_names()
+        start, lines = head, []
+        # Merge into the summary left by an earlier compaction rather than stacking a new one
+        previous = self._messages[head - 1] if head else None
+        if previous is not None and (previous.content or "").startswith(SUMMARY_PREFIX):
+            start = head - 1
+            lines = previous.content[len(SUMMARY_PREFIX):].split("\n")
+        for message in self._messages[head:end]:
+            role = message.role
+            if role == "tool":
+                name = names.get(message.tool_call_id, "tool")
+                lines.append(f"- {name} -> {_first_line(message.content)}")
+            elif message.content:
+                lines.append(f"- {role}: {_first_line(message.content)}")
+        summary = Message("user", SUMMARY_PREFIX + "\n".join(lines[-SUMMARY_MAX_LINES:]))
+        removed = sum(self._tokens[start:end])
+        self._messages[start:end] = [summary]
+        self._tokens[start:end] = [message_tokens(summary)]
+        self.total_tokens += self._tokens[start] - removed
@@ -0,0 +1,445 @@
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from context import count_tokens
+
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crew_manifest.csv")
+
+# Column types of the crew table, in manifest order
+CREW_COLUMNS = {
+    "first_name": "TEXT",
+    "last_name": "TEXT",
+    "birthday": "TEXT",
+    "role": "TEXT",
+    "status": "TEXT",
+    "years_of_service": "INTEGER",
+    "specialization": "TEXT",
+    "clearance_level": "INTEGER",
+}
+INDEXED_COLUMNS = ["last_name", "first_name", "role", "status"]
+
+MMAP_SIZE = 256 * 1024 * 1024
+
+# Budget for one encoded query result, and how far past it rows are still counted
+RESULT_MAX_BYTES = 4096
+RESULT_MAX_TOKENS = 1024
+RESULT_COUNT_LIMIT = 10_000
+FETCH_SIZE = 64
+
+# Budget for running one agent query: wall-clock seconds and SQLite virtual machine steps,
+# checked by a progress handler every PROGRESS_INTERVAL steps
+QUERY_MAX_SECONDS = 1.0
+QUERY_MAX_STEPS = 20_000_000
+PROGRESS_INTERVAL = 1000
+# Idle guarded connections kept for reuse; more are opened while all are busy
+POOL_SIZE = 8
+STATEMENT_CACHE_SIZE = 128
+# Limits on guarded connections for work a single function call can do, which the progress
+# handler does not see: the largest string or blob a query can build (crew values are short),
+# and the size of the statement itself
+QUERY_LIMITS = {
+    sqlite3.SQLITE_LIMIT_LENGTH: 100_000,
+    sqlite3.SQLITE_LIMIT_SQL_LENGTH: 10_000,
+    sqlite3.SQLITE_LIMIT_COMPOUND_SELECT: 50,
+    sqlite3.SQLITE_LIMIT_EXPR_DEPTH: 100,
+    sqlite3.SQLITE_LIMIT_LIKE_PATTERN_LENGTH: 1000,
+}
+
+# Pragmas that only read the schema; every other pragma (and all writes) is refused
+READ_ONLY_PRAGMAS = {
+    "table_info", "table_xinfo", "table_list", "index_list", "index_info", "index_xinfo",
+    "foreign_key_list", "database_list", "collation_list",
+}
+_ALLOWED_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+SCHEMA_TABLES = {"sqlite_master", "sqlite_schema", "sqlite_temp_master", "sqlite_temp_schema"}
+# Their width and precision are not bounded by SQLITE_LIMIT_LENGTH: printf('%.*c', 400000000, 'x')
+# runs for seconds inside one call
+DENIED_FUNCTIONS = {"printf", "format"}
+
+
+class QueryError(Exception):
+    """A query the guard refused or stopped; the message is meant for the agent"""
+
+
+class QueryNotAllowed(QueryError):
+    pass
+
+
+class QueryBudgetExceeded(QueryError):
+    pass
+
+
+class GuardedConnection:
+    """
+    A read-only connection for untrusted queries: an authorizer allows only reads, and a
+    progress handler interrupts a statement once it runs past its time or step budget.
+    The budget covers fetching rows too, since SQLite does most of the work per row.
+    schema_only tells whether the last statement read the schema and nothing else.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, generation: int):
+        self.conn = conn
+        self.generation = generation
+        self.deadline = None
+        self.deadline_seconds = None
+        self.steps = 0
+        self.max_steps = None
+        self.exceeded = None
+        self.schema_only = False
+        # Cached statements are not authorized again, so remember what each one read
+        self._prepared = self._reads_schema = self._reads_other = False
+        self._statements_schema_only: dict[str, bool] = {}
+        for limit, value in QUERY_LIMITS.items():
+            conn.setlimit(limit, value)
+        conn.set_authorizer(self._authorize)
+        conn.set_progress_handler(self._progress, PROGRESS_INTERVAL)
+
+    def _authorize(self, action: int, arg1, arg2, database, trigger) -> int:
+        self._prepared = True
+        if action in _ALLOWED_ACTIONS:
+            if action == sqlite3.SQLITE_FUNCTION and arg2.lower() in DENIED_FUNCTIONS:
+                return sqlite3.SQLITE_DENY
+            if action == sqlite3.SQLITE_READ and arg1 in SCHEMA_TABLES:
+                self._reads_schema = True
+            elif action in (sqlite3.SQLITE_READ, sqlite3.SQLITE_RECURSIVE):
+                self._reads_other = True
+            return sqlite3.SQLITE_OK
+        # These pragmas only read the schema, whatever their argument
+        if action == sqlite3.SQLITE_PRAGMA and arg1.lower() in READ_ONLY_PRAGMAS:
+            self._reads_schema = True
+            return sqlite3.SQLITE_OK
+        return sqlite3.SQLITE_DENY
+
+    def _progress(self) -> int:
+        if self.deadline is None:
+            return 0
+        self.steps += PROGRESS_INTERVAL
+        if self.steps > self.max_steps:
+            self.exceeded = f"{self.max_steps} steps"
+        elif time.monotonic() > self.deadline:
+            self.exceeded = f"{self.deadline_seconds:g} seconds"
+        return 1 if self.exceeded else 0
+
+    def start(self, max_seconds: float, max_steps: int):
+        self.deadline_seconds = max_seconds
+        self.deadline = time.monotonic() + max_seconds
+        self.steps, self.max_steps, self.exceeded = 0, max_steps, None
+
+    def stop(self):
+        self.deadline = None
+
+    def execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        self._prepared = self._reads_schema = self._reads_other = False
+        cursor = self.conn.execute(sql, params)
+        if self._prepared:
+            self.schema_only = self._reads_schema and not self._reads_other
+            if len(self._statements_schema_only) >= STATEMENT_CACHE_SIZE:
+                self._statements_schema_only.clear()
+            self._statements_schema_only[sql] = self.schema_only
+        else:
+            self.schema_only = self._statements_schema_only.get(sql, False)
+        return cursor
+
+    def error(self, error: sqlite3.Error) -> Exception:
+        """The QueryError an sqlite3 error stands for, or the error itself"""
+        if self.exceeded:
+            return QueryBudgetExceeded(
+                f"the query was stopped after {self.exceeded}. Add a WHERE clause or avoid joining "
+                "large tables to themselves.")
+        message = str(error)
+        if "not authorized" in message:
+            return QueryNotAllowed(
+                "only reading queries are allowed (SELECT, WITH ... SELECT, and "
+                f"PRAGMA {', '.join(sorted(READ_ONLY_PRAGMAS))}), without "
+                f"{' or '.join(sorted(DENIED_FUNCTIONS))}.")
+        if message == "string or blob too big":
+            return QueryBudgetExceeded(
+                f"a value grew past {QUERY_LIMITS[sqlite3.SQLITE_LIMIT_LENGTH]} bytes.")
+        if message == "query string is too large":
+            return QueryBudgetExceeded(
+                f"the query is longer than {QUERY_LIMITS[sqlite3.SQLITE_LIMIT_SQL_LENGTH]} characters.")
+        return error
+
+
+def _manifest_hash(csv_path: str) -> int:
+    """Hash the manifest contents down to 64 bits so it fits in the database header"""
+    digest = hashlib.sha256()
+    with open(csv_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return int.from_bytes(digest.digest()[:8], "big", signed=True)
+
+
+def _split_hash(value: int) -> tuple[int, int]:
+    # SQLite stores application_id and user_version as signed 32-bit integers
+    high = (value >> 32) & 0xFFFFFFFF
+    low = value & 0xFFFFFFFF
+    return (high - (1 << 32) if high >= (1 << 31) else high,
+            low - (1 << 32) if low >= (1 << 31) else low)
+
+
+class CrewDatabase:
+    """
+    On-disk SQLite copy of the crew manifest.
+
+    The database file is built from the CSV once and rebuilt only when the manifest
+    changes. A hash of the manifest is kept in the database header (application_id and
+    user_version), so a touched but unchanged CSV does not trigger a rebuild.
+    Trusted queries share a single read-only, memory-mapped connection; agent queries run
+    through guarded() on a pool of connections, so a slow one does not hold up the others.
+    """
+
+    def __init__(self, csv_path: str = MANIFEST_PATH, db_path: str = None):
+        self.csv_path = csv_path
+        self.db_path = db_path or os.path.splitext(csv_path)[0] + ".db"
+        self.lock = threading.RLock()
+        self._conn: sqlite3.Connection = None
+        self._csv_mtime = None
+        self._generation = 0
+        self._idle: list[GuardedConnection] = []
+
+    def connection(self) -> sqlite3.Connection:
+        """Return the shared read-only connection, rebuilding the database first if the manifest changed"""
+        mtime = os.stat(self.csv_path).st_mtime_ns
+        if self._conn is not None and mtime == self._csv_mtime:
+            return self._conn
+        with self.lock:
+            if self._conn is None or mtime != self._csv_mtime:
+                self._refresh(mtime)
+            return self._conn
+
+    def query(self, sql: str, params=()) -> tuple[list[str], list[tuple]]:
+        """Execute a query and return the column names and all rows"""
+        conn = self.connection()
+        with self.lock:
+            cursor = conn.execute(sql, params)
+            columns = [column[0] for column in cursor.description or []]
+            return columns, cursor.fetchall()
+
+    @contextmanager
+    def guarded(self, max_seconds: float = QUERY_MAX_SECONDS, max_steps: int = QUERY_MAX_STEPS):
+        """
+        A GuardedConnection from the pool with a fresh budget. sqlite3 errors raised inside
+        the block come out as QueryNotAllowed or QueryBudgetExceeded when that is their cause.
+        """
+        guard = self._acquire()
+        guard.start(max_seconds, max_steps)
+        try:
+            yield guard
+        except sqlite3.Error as e:
+            error = guard.error(e)
+            if error is e:
+                raise
+            raise error from e
+        finally:
+            guard.stop()
+            self._release(guard)
+
+    def _acquire(self) -> GuardedConnection:
+        self.connection()
+        with self.lock:
+            while self._idle:
+                guard = self._idle.pop()
+                if guard.generation == self._generation:
+                    return guard
+                guard.conn.close()
+            generation = self._generation
+        return GuardedConnection(self._connect(), generation)
+
+    def _release(self, guard: GuardedConnection):
+        with self.lock:
+            if guard.generation == self._generation and len(self._idle) < POOL_SIZE:
+                self._idle.append(guard)
+                return
+        guard.conn.close()
+
+    def close(self):
+        with self.lock:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = None
+            self._csv_mtime = None
+            for guard in self._idle:
+                guard.conn.close()
+            self._idle.clear()
+            # Connections still in use are closed when they come back
+            self._generation += 1
+
+    def _refresh(self, mtime: int):
+        if not self._is_current(mtime):
+            self.close()
+            self._build()
+        if self._conn is None:
+            self._conn = self._connect()
+        self._csv_mtime = mtime
+
+    def _is_current(self, mtime: int) -> bool:
+        stored = self._stored_hash()
+        if stored is None:
+            return False
+        # A database written after the manifest was last modified is trusted without hashing
+        if self._conn is None and os.stat(self.db_path).st_mtime_ns >= mtime:
+            return True
+        if stored != _split_hash(_manifest_hash(self.csv_path)):
+            return False
+        # Manifest was touched but its contents are unchanged; move the database mtime
+        # forward so the next process can skip hashing
+        os.utime(self.db_path)
+        return True
+
+    def _stored_hash(self):
+        if not os.path.exists(self.db_path):
+            return None
+        try:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            try:
+                header = (conn.execute("PRAGMA application_id").fetchone()[0],
+                          conn.execute("PRAGMA user_version").fetchone()[0])
+            finally:
+                conn.close()
+        except sqlite3.DatabaseError:
+            return None
+        return header if header != (0, 0) else None
+
+    def _build(self):
+        """Load the manifest into a fresh database file and swap it into place atomically"""
+        tmp_path = f"{self.db_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.execute("PRAGMA journal_mode=OFF")
+            conn.execute("PRAGMA synchronous=OFF")
+            columns = ", ".join(f'"{name}" {sql_type}' for name, sql_type in CREW_COLUMNS.items())
+            conn.execute(f"CREATE TABLE crew ({columns})")
+            converters = [int if sql_type == "INTEGER" else str for sql_type in CREW_COLUMNS.values()]
+            with open(self.csv_path, newline="") as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                rows = ([convert(value) for convert, value in zip(converters, row)] for row in reader if row)
+                placeholders = ", ".join("?" for _ in CREW_COLUMNS)
+                conn.executemany(f"INSERT INTO crew VALUES ({placeholders})", rows)
+            for column in INDEXED_COLUMNS:
+                conn.execute(f'CREATE INDEX idx_crew_{column} ON crew("{column}")')
+            application_id, user_version = _split_hash(_manifest_hash(self.csv_path))
+            conn.execute(f"PRAGMA application_id={application_id}")
+            conn.execute(f"PRAGMA user_version={user_version}")
+            conn.commit()
+        except BaseException:
+            conn.close()
+            os.remove(tmp_path)
+            raise
+        conn.close()
+        os.replace(tmp_path, self.db_path)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        conn.execute("PRAGMA query_only=ON")
+        return conn
+
+
+_databases: dict[str, CrewDatabase] = {}
+_databases_lock = threading.Lock()
+
+
+def get_database(csv_path: str = MANIFEST_PATH) -> CrewDatabase:
+    """Return the process-wide database for a manifest, so the connection is reused across calls and episodes"""
+    csv_path = os.path.abspath(csv_path)
+    database = _databases.get(csv_path)
+    if database is None:
+        with _databases_lock:
+            database = _databases.setdefault(csv_path, CrewDatabase(csv_path))
+    return database
+
+
+def _tsv_value(value) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, str):
+        return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    if isinstance(value, bytes):
+        return value.hex()
+    return str(value)
+
+
+def _jsonl_row(columns: list[str], row: tuple) -> str:
+    return json.dumps(dict(zip(columns, row)), separators=(",", ":"), ensure_ascii=False,
+                      default=lambda value: value.hex() if isinstance(value, bytes) else str(value))
+
+
+def encode_results(cursor: sqlite3.Cursor, format: str = "tsv", max_bytes: int = RESULT_MAX_BYTES,
+                   max_tokens: int = RESULT_MAX_TOKENS, count_limit: int = RESULT_COUNT_LIMIT,
+                   max_rows: int = None) -> str:
+    """
+    Encode a query result as TSV (a header line, then one line per row; NULL for nulls and
+    backslash escapes for tabs and newlines) or JSON lines, fetching rows in batches. Rows
+    stop after max_rows, or once the next one would exceed max_bytes or max_tokens; an
+    explicit marker then says how many rows were left out, counting on up to count_limit
+    rows (as far as the query's budget allows).
+    """
+    if cursor.description is None:
+        return "(no result set)"
+    columns = [column[0] for column in cursor.description]
+    if format == "tsv":
+        lines = ["\t".join(columns)]
+        encode = lambda row: "\t".join(map(_tsv_value, row))
+    elif format == "jsonl":
+        lines = []
+        encode = lambda row: _jsonl_row(columns, row)
+    else:
+        raise ValueError(f"unknown result format '{format}', use tsv or jsonl")
+
+    used_bytes = sum(len(line.encode()) + 1 for line in lines)
+    used_tokens = sum(count_tokens(line) for line in lines)
+    shown, limit, left_over = 0, None, 0
+    while limit is None:
+        batch = cursor.fetchmany(FETCH_SIZE)
+        if not batch:
+            break
+        for position, row in enumerate(batch):
+            if max_rows is not None and shown >= max_rows:
+                limit = f"{max_rows} rows"
+                left_over = len(batch) - position
+                break
+            line = encode(row)
+            size, tokens = len(line.encode()) + 1, count_tokens(line)
+            if used_bytes + size > max_bytes:
+                limit = f"{max_bytes} bytes"
+            elif used_tokens + tokens > max_tokens:
+                limit = f"{max_tokens} tokens"
+            if limit:
+                left_over = len(batch) - position
+                break
+            lines.append(line)
+            used_bytes += size
+            used_tokens += tokens
+            shown += 1
+
+    if limit is None:
+        lines.append(f"({shown} row{'' if shown == 1 else 's'})")
+        return "\n".join(lines)
+    # Count the rest without encoding it, so the agent knows how much it did not see
+    total = shown + left_over
+    try:
+        while total < count_limit:
+            batch = cursor.fetchmany(max(FETCH_SIZE, 1024))
+            if not batch:
+                break
+            total += len(batch)
+        else:
+            total = f"at least {total}"
+    except sqlite3.OperationalError:
+        # The guard stopped the count; the rows already encoded are still worth returning
+        total = f"at least {total}"
+    hint = "Add a WHERE clause or use LIMIT and OFFSET to page." if limit.endswith("rows") else \
+        "Select fewer columns or add a WHERE clause."
+    lines.append(f"[Truncated at {limit}: showing {shown} of {total} rows. {hint}]")
+    return "\n".join(lines)
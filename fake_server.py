@@ -0,0 +1,465 @@
+"""
+Local stand-in for the Azure OpenAI chat completions endpoint, for offline load testing.
+
+Responses come from a pluggable policy:
+- scripted: follows the solution path from the README
+- random:   calls a random available tool with plausible arguments
+- replay:   replays the assistant messages of a recorded trace
+
+Point a client at it through `azure_endpoint`:
+
+    python fake_server.py --policy scripted --port 8123 --latency 0.2
+    AzureOpenAI(azure_endpoint="http://127.0.0.1:8123", api_key="fake", api_version=...)
+
+or run it in-process with `with FakeServer(ScriptedSolver()) as server: ...server.url...`.
+To measure harness throughput, point the runner at it:
+
+    AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8123 AZURE_OPENAI_API_KEY=fake python runner.py --episodes 500
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+import zlib
+from urllib.parse import urlsplit
+
+STREAM_PIECE_CHARS = 16
+
+logger = logging.getLogger(__name__)
+
+AI_ANSWER = ("The initials RS on the login screen most likely belong to a crew member. "
+             "Look them up in the crew database; 8 digit passwords are often a birthday written as YYYYMMDD.")
+
+# The example run from the README, one assistant turn per entry; None ends the episode
+SOLUTION_PATH = [
+    ("think", {"text": "I need to find the password to activate the navigation system in the control room. "
+                       "I should explore the spaceship and gather information that might help me find the password."}),
+    ("move_to", {"location_name": "crew_quarters"}),
+    ("move_to", {"location_name": "engine_room"}),
+    ("check_logs", {}),
+    ("fabricate_component", {"component_id": "NR-47X"}),
+    ("move_to", {"location_name": "control_room"}),
+    ("use_database", {"query": "SELECT name FROM sqlite_master WHERE type='table'"}),
+    ("use_database", {"query": "PRAGMA table_info(crew)"}),
+    ("use_database", {"query": "SELECT * FROM crew WHERE role = 'Captain'"}),
+    ("think", {"text": "The user is likely Robert Stern, the Captain of the ship. The password might be related "
+                       "to his personal details. I should gather more information about him."}),
+    ("use_database", {"query": "SELECT * FROM crew WHERE first_name = 'Robert' AND last_name = 'Stern'"}),
+    ("think", {"text": "Robert Stern's birthday is 1980-05-15. The password might be related to his birthday. "
+                       "I will try using '19800515' as the password to activate the navigation system."}),
+    ("activate_navigation_system", {"password": "19800515"}),
+    ("move_to", {"location_name": "engine_room"}),
+    ("repair_navigation_system", {}),
+    ("move_to", {"location_name": "control_room"}),
+    ("activate_navigation_system", {"password": "19800515"}),
+    None,
+]
+
+
+def _model_turns(messages: list) -> list:
+    # A nudge echoes the model's text back as a second assistant message; skip those echoes
+    return [
+        message for i, message in enumerate(messages)
+        if message.get("role") == "assistant" and not (i and messages[i - 1].get("role") == "assistant")
+    ]
+
+
+class Policy:
+    """Decides the assistant message for a chat completion request"""
+
+    def respond(self, request: dict) -> dict:
+        raise NotImplementedError
+
+    def answer(self, request: dict) -> dict:
+        """Reply to a plain request without tools, such as the o1-mini call from ask_artificial_intelligence"""
+        return {"role": "assistant", "content": AI_ANSWER}
+
+    @staticmethod
+    def tool_call_message(name: str, args: dict, call_id: str) -> dict:
+        return {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [{
+                "id": call_id,
+                "type": "function",
+                "function": {"name": name, "arguments": json.dumps(args)},
+            }],
+        }
+
+
+class ScriptedSolver(Policy):
+    """Follows the README solution path; the step is derived from the conversation so the policy is stateless"""
+
+    def __init__(self, path: list = None):
+        self.path = path or SOLUTION_PATH
+
+    def respond(self, request: dict) -> dict:
+        step = 0
+        # Call ids carry the step number, so the position survives context compaction
+        for message in reversed(request.get("messages", [])):
+            if message.get("role") == "assistant" and message.get("tool_calls"):
+                step = int(message["tool_calls"][0]["id"].rsplit("_", 1)[1]) + 1
+                break
+        action = self.path[step] if step < len(self.path) else None
+        if action is None:
+            return {"role": "assistant", "content": "The navigation system is activated. My task is complete."}
+        name, args = action
+        return self.tool_call_message(name, args, f"call_{step}")
+
+
+class RandomToolCaller(Policy):
+    """Calls a random available tool; seeded per request so a given conversation always gets the same reply"""
+
+    ARGUMENTS = {
+        "location_name": ["engine_room", "control_room", "crew_quarters", "cargo_bay"],
+        "component_id": ["NR-47X", "GYRO-02", "ACCEL-05", "PDRIVE-3"],
+        "password": ["19800515", "12345678", "RS", "00000000"],
+        "query": [
+            "SELECT name FROM sqlite_master WHERE type='table'",
+            "SELECT * FROM crew WHERE role = 'Captain'",
+            "SELECT * FROM crew WHERE last_name LIKE 'S%'",
+            "SELECT first_name, last_name FROM crew WHERE status = 'active'",
+        ],
+        "text": ["Let me think about what to do next.", "I should explore the ship."],
+        "request": ["What could the password be?"],
+    }
+
+    def __init__(self, seed: int = 0, text_probability: float = 0.05):
+        self.seed = seed
+        self.text_probability = text_probability
+
+    def respond(self, request: dict) -> dict:
+        messages = request.get("messages", [])
+        # crc32 rather than hash(), which is salted per process
+        last = json.dumps(messages[-1:], sort_keys=True, default=str)
+        rng = random.Random(zlib.crc32(f"{self.seed}:{len(messages)}:{last}".encode()))
+        tools = request.get("tools") or []
+        if not tools or rng.random() < self.text_probability:
+            return {"role": "assistant", "content": "I am not sure what to do next."}
+        function = rng.choice(tools)["function"]
+        args = {
+            name: rng.choice(self.ARGUMENTS.get(name, ["test"]))
+            for name in function["parameters"]["properties"]
+        }
+        return self.tool_call_message(function["name"], args, f"call_{len(messages)}")
+
+
+class ReplayPolicy(Policy):
+    """
+    Replays the assistant messages of a recorded trace, in order. The trace is a JSON list of
+    messages in the API wire format, or JSON lines with one message per line.
+    """
+
+    def __init__(self, trace_path: str):
+        with open(trace_path) as f:
+            text = f.read()
+        try:
+            messages = json.loads(text)
+        except json.JSONDecodeError:
+            messages = [json.loads(line) for line in text.splitlines() if line.strip()]
+        self.turns = _model_turns(messages)
+        self.steps_by_call_id = {
+            tool_call["id"]: step
+            for step, message in enumerate(self.turns)
+            for tool_call in message.get("tool_calls") or []
+        }
+
+    def respond(self, request: dict) -> dict:
+        turns = _model_turns(request.get("messages", []))
+        step = len(turns)
+        # Prefer the position of the last replayed tool call, which survives context compaction
+        for index in range(len(turns) - 1, -1, -1):
+            tool_calls = turns[index].get("tool_calls")
+            if tool_calls and tool_calls[0]["id"] in self.steps_by_call_id:
+                step = self.steps_by_call_id[tool_calls[0]["id"]] + len(turns) - index
+                break
+        if step >= len(self.turns):
+            return {"role": "assistant", "content": "End of recorded trace."}
+        return dict(self.turns[step])
+
+
+class FakeServer:
+    """
+    Minimal HTTP/1.1 server (keep-alive, asyncio) answering chat completion requests.
+
+    latency is the base delay per request (time to first chunk when streaming), jitter a
+    random extra delay, and seconds_per_token an additional delay per completion token.
+    Requests with stream=True get server-sent chat.completion.chunk events. prompt_tokens fixes the
+    reported prompt usage (estimated from the request size when None). error_rate is the
+    fraction of requests answered with a 429 to exercise client retries.
+    """
+
+    def __init__(self, policy: Policy, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, seconds_per_token: float = 0.0, prompt_tokens: int = None,
+                 completion_tokens: int = None, error_rate: float = 0.0, seed: int = 0):
+        self.policy = policy
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.seconds_per_token = seconds_per_token
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.ids = itertools.count()
+        self._loop: asyncio.AbstractEventLoop = None
+        self._server: asyncio.AbstractServer = None
+        self._thread: threading.Thread = None
+        self._connections: dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def serve(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port, backlog=4096)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self._server
+
+    def start(self) -> FakeServer:
+        """Serve from a background thread; returns once the port is bound"""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.serve())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="fake-openai-server", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop is None:
+            return
+
+        async def shutdown():
+            self._server.close()
+            # Idle keep-alive connections would otherwise outlive the loop
+            for writer in self._connections.values():
+                writer.close()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    def __enter__(self) -> FakeServer:
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    # The rest of the stream cannot be framed, so answer and close
+                    logger.warning("Malformed HTTP request: %r", request_line)
+                    self._write_response(writer, 400, {"error": {
+                        "message": f"malformed HTTP request: {request_line[:100]!r}", "code": "bad_request"}})
+                    await writer.drain()
+                    break
+                body = await reader.readexactly(length)
+                status, payload = await self._dispatch(method, urlsplit(target).path, body)
+                if isinstance(payload, dict):
+                    self._write_response(writer, status, payload)
+                    await writer.drain()
+                else:
+                    await self._write_stream(writer, payload)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.pop(task, None)
+            writer.close()
+
+    def _write_response(self, writer: asyncio.StreamWriter, status: int, payload: dict):
+        data = json.dumps(payload).encode()
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 429: "Too Many Requests",
+                  500: "Internal Server Error"}.get(status, "")
+        headers = [
+            f"HTTP/1.1 {status} {reason}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(data)}",
+            "Connection: keep-alive",
+        ]
+        if status == 429:
+            headers.append("Retry-After: 0")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode() + data)
+
+    async def _write_stream(self, writer: asyncio.StreamWriter, chunks):
+        """Send server-sent events over a chunked response so the connection can be kept alive"""
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: keep-alive\r\n\r\n")
+
+        def send(data: bytes):
+            writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+        async for payload in chunks:
+            send(f"data: {json.dumps(payload)}\n\n".encode())
+            await writer.drain()
+        send(b"data: [DONE]\n\n")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> tuple[int, dict]:
+        if method != "POST" or not path.endswith("/chat/completions"):
+            return 404, {"error": {"message": f"No route for {method} {path}", "code": "not_found"}}
+        self.requests += 1
+        try:
+            request = json.loads(body or b"{}")
+        except json.JSONDecodeError as e:
+            return 400, {"error": {"message": str(e), "code": "invalid_json"}}
+        if not isinstance(request, dict) or not isinstance(request.get("messages", []), list):
+            return 400, {"error": {"message": "the body must be a JSON object with a list of messages",
+                                   "code": "invalid_request"}}
+        # Azure puts the deployment name in the path rather than the body
+        parts = path.strip("/").split("/")
+        model = parts[parts.index("deployments") + 1] if "deployments" in parts else request.get("model", "gpt-4o")
+
+        if self.error_rate and self.rng.random() < self.error_rate:
+            return 429, {"error": {"message": "Rate limit exceeded (injected)", "code": "429"}}
+
+        try:
+            if model.startswith("o1") or not request.get("tools"):
+                message = self.policy.answer(request)
+            else:
+                message = self.policy.respond(request)
+        except Exception as e:
+            # A policy bug, such as a scripted policy given a history it did not write; reported
+            # as a server error rather than a dropped connection the client would retry
+            logger.exception("%s failed on request %d", type(self.policy).__name__, self.requests)
+            return 500, {"error": {"message": f"{type(self.policy).__name__} failed: {type(e).__name__}: {e}",
+                                   "code": "policy_error"}}
+        completion_tokens = self.completion_tokens or max(1, len(json.dumps(message)) // 4)
+        prompt_tokens = self.prompt_tokens or max(1, len(body) // 4)
+
+        delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        finish_reason = "tool_calls" if message.get("tool_calls") else "stop"
+        header = {"id": f"chatcmpl-fake-{next(self.ids)}", "created": int(time.time()), "model": model}
+
+        if request.get("stream"):
+            include_usage = (request.get("stream_options") or {}).get("include_usage", False)
+            return 200, self._stream(header, message, finish_reason, usage if include_usage else None, delay)
+
+        delay += completion_tokens * self.seconds_per_token
+        if delay:
+            await asyncio.sleep(delay)
+        return 200, {
+            **header,
+            "object": "chat.completion",
+            "choices": [{"index": 0, "finish_reason": finish_reason, "message": message}],
+            "usage": usage,
+        }
+
+    async def _stream(self, header: dict, message: dict, finish_reason: str, usage: dict, delay: float):
+        """Yield the message as chat.completion.chunk deltas, pacing each piece by its token count"""
+        def chunk(delta: dict, finish: str = None) -> dict:
+            return {**header, "object": "chat.completion.chunk",
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+
+        def pieces(text: str):
+            for start in range(0, len(text), STREAM_PIECE_CHARS):
+                yield text[start:start + STREAM_PIECE_CHARS]
+
+        async def paced(piece: str):
+            if self.seconds_per_token:
+                await asyncio.sleep(max(1, len(piece) // 4) * self.seconds_per_token)
+
+        if delay:
+            await asyncio.sleep(delay)
+        yield chunk({"role": "assistant", "content": "" if message.get("content") else None})
+        for piece in pieces(message.get("content") or ""):
+            await paced(piece)
+            yield chunk({"content": piece})
+        for index, tool_call in enumerate(message.get("tool_calls") or []):
+            function = tool_call["function"]
+            yield chunk({"tool_calls": [{"index": index, "id": tool_call["id"], "type": "function",
+                                         "function": {"name": function["name"], "arguments": ""}}]})
+            for piece in pieces(function["arguments"]):
+                await paced(piece)
+                yield chunk({"tool_calls": [{"index": index, "function": {"arguments": piece}}]})
+        yield chunk({}, finish_reason)
+        if usage:
+            yield {**header, "object": "chat.completion.chunk", "choices": [], "usage": usage}
+
+
+def create_policy(name: str, trace: str = None, seed: int = 0) -> Policy:
+    if name == "replay":
+        if not trace:
+            raise ValueError("The replay policy needs --trace")
+        return ReplayPolicy(trace)
+    if name == "random":
+        return RandomToolCaller(seed=seed)
+    return ScriptedSolver()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--policy", choices=["scripted", "random", "replay"], default="scripted")
+    parser.add_argument("--trace", help="trace file for the replay policy")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--latency", type=float, default=0.0, help="base seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra seconds per request")
+    parser.add_argument("--seconds-per-token", type=float, default=0.0)
+    parser.add_argument("--prompt-tokens", type=int, default=None)
+    parser.add_argument("--completion-tokens", type=int, default=None)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = FakeServer(
+        create_policy(args.policy, args.trace, args.seed), host=args.host, port=args.port,
+        latency=args.latency, jitter=args.jitter, seconds_per_token=args.seconds_per_token,
+        prompt_tokens=args.prompt_tokens, completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate, seed=args.seed,
+    )
+
+    async def serve_forever():
+        await server.serve()
+        print(f"Serving fake chat completions on {server.url} ({args.policy} policy)")
+        await server._server.serve_forever()
+
+    try:
+        asyncio.run(serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Iterable
+
+
+class LocationGraph:
+    """
+    Adjacency index of a world's locations: a set of neighbour names per location, so
+    adjacency checks are O(1) however large the world is. Breadth-first distances are
+    computed once per source and cached until the graph changes.
+    """
+
+    def __init__(self):
+        self.adjacency: dict[str, set[str]] = {}
+        self._distances: dict[str, dict[str, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.adjacency)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.adjacency
+
+    def add(self, name: str, neighbors: Iterable[str] = ()):
+        """Add a location and its outgoing edges"""
+        self.adjacency.setdefault(name, set()).update(neighbors)
+        self._distances.clear()
+
+    def connect(self, a: str, b: str):
+        """Add an edge in both directions"""
+        self.adjacency.setdefault(a, set()).add(b)
+        self.adjacency.setdefault(b, set()).add(a)
+        self._distances.clear()
+
+    def neighbors(self, name: str) -> set[str]:
+        return self.adjacency.get(name, set())
+
+    def is_adjacent(self, a: str, b: str) -> bool:
+        return b in self.adjacency.get(a, ())
+
+    def distances_from(self, source: str) -> dict[str, int]:
+        """Moves needed to reach every reachable location from source"""
+        distances = self._distances.get(source)
+        if distances is None:
+            distances = {source: 0}
+            queue = deque([source])
+            while queue:
+                name = queue.popleft()
+                distance = distances[name] + 1
+                for neighbor in self.adjacency.get(name, ()):
+                    if neighbor not in distances:
+                        distances[neighbor] = distance
+                        queue.append(neighbor)
+            self._distances[source] = distances
+        return distances
+
+    def precompute(self, sources: Iterable[str]):
+        for source in sources:
+            self.distances_from(source)
+
+    def distance(self, a: str, b: str) -> int | None:
+        return self.distances_from(a).get(b)
+
+    def reachable(self, source: str) -> set[str]:
+        return set(self.distances_from(source))
+
+    def shortest_path(self, a: str, b: str) -> list[str] | None:
+        """Location names from a to b inclusive, or None if b cannot be reached"""
+        parents = {a: None}
+        queue = deque([a])
+        while queue:
+            name = queue.popleft()
+            if name == b:
+                path = []
+                while name is not None:
+                    path.append(name)
+                    name = parents[name]
+                return path[::-1]
+            for neighbor in self.adjacency.get(name, ()):
+                if neighbor not in parents:
+                    parents[neighbor] = name
+                    queue.append(neighbor)
+        return None
+
+    def route_length(self, stops: Iterable[str]) -> int | None:
+        """Fewest moves visiting stops in order, or None if one is unreachable from the previous"""
+        stops = list(stops)
+        total = 0
+        for a, b in zip(stops, stops[1:]):
+            distance = self.distance(a, b)
+            if distance is None:
+                return None
+            total += distance
+        return total
+
+    def exploration_efficiency(self, path: list[str], stops: Iterable[str]) -> float | None:
+        """
+        Shortest route through stops divided by the moves actually made along path: 1.0 is
+        a perfect run, lower values mean detours. None if the stops are not connected.
+        """
+        optimal = self.route_length(stops)
+        if optimal is None:
+            return None
+        moves = len(path) - 1
+        return min(1.0, optimal / moves) if moves > 0 else 1.0
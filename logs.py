@@ -0,0 +1,293 @@
+"""
+Indexed ship logs behind EngineRoom.check_logs.
+
+A log file is parsed once, streaming over a memory map, into columnar arrays: where each
+entry's message starts in the file, its level, timestamp, subsystem and component. Message
+text stays in the file and is decoded only for the entries a query returns, so a log of
+millions of lines costs a few dozen bytes per entry in memory.
+
+Log format:
+
+    [LOG START] [NAV-SYSTEM] [Timestamp: 2235-06-14 15:32:45 UTC]
+    [Timestamp: 2235-06-14 15:33:12 UTC]
+    INFO: Gyroscope calibration verified. [Module ID: GYRO-02]
+    [LOG END]
+
+Entries take the timestamp of the last [Timestamp: ...] line before them.
+"""
+from __future__ import annotations
+
+import mmap
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+LOG_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+FAILED_LOG_PATH = os.path.join(LOG_DIRECTORY, "navigation_failed.log")
+REPAIRED_LOG_PATH = os.path.join(LOG_DIRECTORY, "navigation_repaired.log")
+
+LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+PAGE_SIZE = 20
+SUMMARY_LATEST = 3
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S UTC"
+NO_TIME = float("-inf")
+
+_ENTRY = re.compile(rb"(DEBUG|INFO|WARNING|ERROR|CRITICAL): ")
+_TIMESTAMP = re.compile(rb"\[Timestamp: ([^\]]+)\]")
+_LOG_START = re.compile(rb"\[LOG START\] \[([^\]]+)\]")
+_COMPONENT_FIELD = re.compile(rb"\[(?:Component|Module|Injector|Beacon|System) ID: ([^\]]+)\]")
+_COMPONENT_NAME = re.compile(rb"\b([A-Z]{2,}-[A-Z0-9]+)\b")
+
+
+class LogRecord(NamedTuple):
+    timestamp: str
+    level: str
+    subsystem: str
+    component: str
+    message: str
+
+    def __str__(self) -> str:
+        prefix = f"[{self.timestamp}] " if self.timestamp else ""
+        return f"{prefix}{self.level}: {self.message}"
+
+
+def parse_time(text: str, default_date: str = None) -> float:
+    """Seconds since the epoch for 'YYYY-MM-DD HH:MM[:SS][ UTC]', or 'HH:MM[:SS]' on default_date"""
+    text = text.strip().removesuffix("UTC").strip().replace("T", " ")
+    if default_date and len(text) <= 8:
+        text = f"{default_date} {text}"
+    for layout in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, layout).replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f"cannot read time '{text}', use YYYY-MM-DD HH:MM:SS or HH:MM:SS")
+
+
+_day_starts: dict[bytes, float] = {}
+
+
+def _log_time(text: bytes) -> float:
+    """parse_time for the log's own 'YYYY-MM-DD HH:MM:SS UTC' stamps, without strptime per line"""
+    if len(text) == 23 and text[10:11] == b" " and text[19:] == b" UTC":
+        day = _day_starts.get(text[:10])
+        if day is None:
+            day = _day_starts[text[:10]] = parse_time(text[:10].decode())
+        try:
+            return day + int(text[11:13]) * 3600 + int(text[14:16]) * 60 + int(text[17:19])
+        except ValueError:
+            pass
+    return parse_time(text.decode())
+
+
+def format_time(seconds: float) -> str:
+    if seconds == NO_TIME:
+        return ""
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime(TIME_FORMAT)
+
+
+class _Codes:
+    """Small integer codes for repeated names (subsystems, components); 0 means none"""
+
+    def __init__(self):
+        self.names = [""]
+        self.codes = {b"": 0}
+
+    def code(self, name: bytes) -> int:
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.names)
+            self.names.append(name.decode())
+        return code
+
+
+class LogStore:
+    """Parsed, indexed log file with filtered, paginated queries"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.starts = array("Q")       # offset of each entry's message in the file
+        self.ends = array("Q")
+        self.levels = array("B")
+        self.times = array("d")
+        self.subsystems = array("H")
+        self.components = array("I")
+        self.subsystem_names = _Codes()
+        self.component_names = _Codes()
+        self.by_level: dict[int, array] = {}
+        self.by_component: dict[int, array] = {}
+        self.times_sorted = True
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._parse()
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def _parse(self):
+        data = self._map
+        position, size = 0, len(data)
+        time, subsystem = NO_TIME, 0
+        while position < size:
+            end = data.find(b"\n", position)
+            if end < 0:
+                end = size
+            line = data[position:end].rstrip(b"\r")
+            entry = _ENTRY.match(line)
+            if entry:
+                level = LEVELS.index(entry.group(1).decode())
+                message = line[entry.end():]
+                component = _COMPONENT_FIELD.search(message) or _COMPONENT_NAME.search(message)
+                index = len(self.starts)
+                self.starts.append(position + entry.end())
+                self.ends.append(position + len(line))
+                self.levels.append(level)
+                self.times.append(time)
+                self.subsystems.append(subsystem)
+                code = self.component_names.code(component.group(1)) if component else 0
+                self.components.append(code)
+                self.by_level.setdefault(level, array("I")).append(index)
+                if code:
+                    self.by_component.setdefault(code, array("I")).append(index)
+            elif line.startswith(b"["):
+                start = _LOG_START.match(line)
+                if start:
+                    subsystem = self.subsystem_names.code(start.group(1))
+                timestamp = _TIMESTAMP.search(line)
+                if timestamp:
+                    parsed = _log_time(timestamp.group(1))
+                    self.times_sorted = self.times_sorted and parsed >= time
+                    time = parsed
+            position = end + 1
+
+    def record(self, index: int) -> LogRecord:
+        return LogRecord(
+            timestamp=format_time(self.times[index]),
+            level=LEVELS[self.levels[index]],
+            subsystem=self.subsystem_names.names[self.subsystems[index]],
+            component=self.component_names.names[self.components[index]],
+            message=self._map[self.starts[index]:self.ends[index]].decode(errors="replace"),
+        )
+
+    def _first_time(self) -> float:
+        # Only entries before the first [Timestamp: ...] line have no time
+        for time in self.times:
+            if time != NO_TIME:
+                return time
+        return NO_TIME
+
+    def _date(self) -> str:
+        first = self._first_time()
+        return format_time(first)[:10] if first != NO_TIME else None
+
+    def _time_range(self, candidates, since: float, until: float):
+        if since is None and until is None:
+            return candidates
+        low = NO_TIME if since is None else since
+        high = float("inf") if until is None else until
+        if not self.times_sorted:
+            return [index for index in candidates if low <= self.times[index] <= high]
+        first, last = bisect_left(self.times, low), bisect_right(self.times, high)
+        if isinstance(candidates, range):
+            return range(max(first, candidates.start), min(last, candidates.stop))
+        # Index arrays are in file order, so the time window is a contiguous slice of them
+        return candidates[bisect_left(candidates, first):bisect_left(candidates, last)]
+
+    def _text_matches(self, text: str) -> array:
+        """Entries whose message contains text, case-insensitively, found by one scan of the file"""
+        matches = array("I")
+        pattern = re.compile(re.escape(text.encode()), re.IGNORECASE)
+        for match in pattern.finditer(self._map):
+            index = bisect_right(self.starts, match.start()) - 1
+            if index >= 0 and match.end() <= self.ends[index] and (not matches or matches[-1] != index):
+                matches.append(index)
+        return matches
+
+    def search(self, level: str = None, component: str = None, since: str = None, until: str = None,
+               contains: str = None) -> list[int] | range | array:
+        """Indices of the entries matching every given filter, in file order"""
+        candidates = range(len(self))
+        if level is not None:
+            level = level.strip().upper()
+            if level not in LEVELS:
+                raise ValueError(f"unknown level '{level}', use one of {', '.join(LEVELS)}")
+            candidates = self.by_level.get(LEVELS.index(level), array("I"))
+        if component is not None:
+            code = self.component_names.codes.get(component.strip().upper().encode())
+            by_component = self.by_component.get(code, array("I")) if code else array("I")
+            candidates = by_component if isinstance(candidates, range) else \
+                [index for index in candidates if self.components[index] == code]
+        date = self._date()
+        candidates = self._time_range(
+            candidates,
+            parse_time(since, date) if since else None,
+            parse_time(until, date) if until else None,
+        )
+        if contains:
+            if isinstance(candidates, range) and len(candidates) == len(self):
+                candidates = self._text_matches(contains)
+            else:
+                needle = contains.lower().encode()
+                candidates = [index for index in candidates
+                              if needle in self._map[self.starts[index]:self.ends[index]].lower()]
+        return candidates
+
+    def query(self, page: int = 1, page_size: int = PAGE_SIZE, **filters) -> tuple[int, list[LogRecord]]:
+        """Total number of matching entries and the records on the requested page"""
+        matches = self.search(**filters)
+        start = (max(page, 1) - 1) * page_size
+        return len(matches), [self.record(index) for index in matches[start:start + page_size]]
+
+    def summary(self) -> str:
+        """Entry counts per level, the time span, and every warning and error (up to a page)"""
+        if not len(self):
+            return "The log is empty."
+        counts = ", ".join(f"{len(self.by_level[level])} {LEVELS[level]}" for level in sorted(self.by_level))
+        first = self._first_time()
+        last = self.times[-1] if self.times_sorted else max(self.times)
+        span = f" from {format_time(first)} to {format_time(last)}" if first != NO_TIME else ""
+        lines = [f"{len(self)} log entries{span}: {counts}."]
+
+        problem_levels = [self.by_level.get(LEVELS.index(level), ()) for level in ("WARNING", "ERROR", "CRITICAL")]
+        problems = sorted(index for indices in problem_levels for index in indices)
+        if problems:
+            components = dict.fromkeys(self.component_names.names[self.components[index]] for index in problems)
+            components.pop("", None)
+            if components:
+                names = list(components)
+                more = f" and {len(names) - PAGE_SIZE} more" if len(names) > PAGE_SIZE else ""
+                lines.append(f"Components with warnings or errors: {', '.join(names[:PAGE_SIZE])}{more}.")
+            lines.append("Warnings and errors:")
+            lines.extend(str(self.record(index)) for index in problems[:PAGE_SIZE])
+            if len(problems) > PAGE_SIZE:
+                lines.append(f"... {len(problems) - PAGE_SIZE} more; filter by level to see them all.")
+        else:
+            lines.append("No warnings or errors.")
+        lines.append("Latest entries:")
+        lines.extend(str(self.record(index)) for index in range(max(0, len(self) - SUMMARY_LATEST), len(self)))
+        return "\n".join(lines)
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+
+_stores: dict[str, LogStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_log_store(path: str) -> LogStore:
+    """Process-wide LogStore for a log file, parsed on first use"""
+    store = _stores.get(path)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(path)
+            if store is None:
+                store = _stores[path] = LogStore(path)
+    return store
@@ -0,0 +1,106 @@
+"""
+Compact message type for Agent.messages.
+
+The history used to hold SDK ChatCompletionMessage objects next to plain dicts. Message
+is a __slots__ object whose tool calls are tuples. Roles, tool names and tool call ids are
+interned; content is not, since most of it (model output, query results, log pages) is
+unique and interned strings are never freed. Content known to repeat in every episode, the
+prompts and location descriptions, is interned by whoever builds those messages with
+intern_content(), so it is stored once per process. to_dict() builds the API wire format
+when a request is sent.
+"""
+from __future__ import annotations
+
+import sys
+from typing import NamedTuple
+
+
+def intern_content(text):
+    """Intern static text such as prompts and location descriptions; leave free text alone"""
+    return sys.intern(text) if type(text) is str else text
+
+
+class Function(NamedTuple):
+    name: str
+    arguments: str
+
+
+class ToolCall(NamedTuple):
+    """Same attribute layout as the SDK tool call: tool_call.id, tool_call.function.name"""
+    id: str
+    function: Function
+    type: str = "function"
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "type": self.type,
+                "function": {"name": self.function.name, "arguments": self.function.arguments}}
+
+
+def to_tool_call(tool_call) -> ToolCall:
+    if isinstance(tool_call, ToolCall):
+        return tool_call
+    if isinstance(tool_call, dict):
+        tool_call_id, function = tool_call["id"], tool_call["function"]
+        name, arguments = function["name"], function.get("arguments")
+    else:
+        tool_call_id, function = tool_call.id, tool_call.function
+        name, arguments = function.name, function.arguments
+    return ToolCall(intern_content(tool_call_id), Function(intern_content(name), arguments))
+
+
+class Message:
+    """
+    One chat message. in_transcript marks the messages ask_artificial_intelligence gets to
+    see: prompts, tool results and nudges, but not the model's own tool-calling turns.
+    """
+    __slots__ = ("role", "content", "tool_calls", "tool_call_id", "in_transcript")
+
+    def __init__(self, role: str, content: str = None, tool_calls: tuple[ToolCall, ...] = None,
+                 tool_call_id: str = None, in_transcript: bool = True):
+        self.role = intern_content(role)
+        self.content = content
+        self.tool_calls = tool_calls
+        self.tool_call_id = intern_content(tool_call_id)
+        self.in_transcript = in_transcript
+
+    def replace(self, content: str) -> Message:
+        return Message(self.role, content, self.tool_calls, self.tool_call_id, self.in_transcript)
+
+    def to_dict(self) -> dict:
+        message = {"role": self.role, "content": self.content}
+        if self.tool_calls:
+            message["tool_calls"] = [tool_call.to_dict() for tool_call in self.tool_calls]
+        if self.tool_call_id is not None:
+            message["tool_call_id"] = self.tool_call_id
+        return message
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Message):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"Message({self.to_dict()!r})"
+
+
+def to_message(message) -> Message:
+    """Convert a dict or an SDK message to a Message. SDK messages are model output, so they
+    are left out of the transcript; dicts (prompts, tool results, nudges) are included."""
+    if isinstance(message, Message):
+        return message
+    if isinstance(message, dict):
+        tool_calls = message.get("tool_calls")
+        return Message(
+            message["role"], message.get("content"),
+            tuple(to_tool_call(tool_call) for tool_call in tool_calls) if tool_calls else None,
+            message.get("tool_call_id"),
+        )
+    tool_calls = getattr(message, "tool_calls", None)
+    return Message(
+        message.role, message.content,
+        tuple(to_tool_call(tool_call) for tool_call in tool_calls) if tool_calls else None,
+        getattr(message, "tool_call_id", None),
+        in_transcript=False,
+    )
@@ -0,0 +1,587 @@
+"""
+Concurrent episode runner.
+
+Runs many independent Agent/World episodes on one event loop over a shared, pooled
+AsyncAzureOpenAI client. Requests go through a token-bucket rate limiter (requests and
+tokens per minute) and are retried with jittered exponential backoff on 429 and 5xx.
+
+    python runner.py --episodes 200 --concurrency 50 --rpm 600 --tpm 300000
+
+With --checkpoint-dir every episode is checkpointed after each turn and finished episodes
+are recorded in a manifest; an interrupted run continues where it stopped with
+
+    python runner.py --resume DIR
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from functools import partial
+from typing import Callable
+
+import httpx
+import openai
+from openai import AsyncAzureOpenAI
+
+from Agent import Agent
+from actions import ToolBatch
+from cache import CompletionCache, is_cacheable
+from checkpoint import EpisodeCheckpoint, RunManifest
+from messages import intern_content
+from pool import WorldPool
+from streaming import StreamAssembler
+from tracing import NULL_TRACER, JsonlSink, Metrics, Tracer, cprofile_hook
+from World import World, create_large_world, create_world
+from prompts import system_prompt, goal_prompt, nudge_prompt
+
+API_VERSION = "2024-08-01-preview"
+RETRY_STATUS_CODES = {408, 409, 429}
+
+
+def create_async_client(max_connections: int = 100, **kwargs) -> AsyncAzureOpenAI:
+    """Create an async client whose HTTP connection pool is shared by all episodes"""
+    kwargs.setdefault("azure_endpoint", os.getenv("AZURE_OPENAI_ENDPOINT"))
+    kwargs.setdefault("api_key", os.getenv("AZURE_OPENAI_API_KEY"))
+    kwargs.setdefault("api_version", API_VERSION)
+    return AsyncAzureOpenAI(
+        # Retries are handled by CompletionCaller so they respect the rate limiter
+        max_retries=0,
+        http_client=openai.DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        ),
+        **kwargs,
+    )
+
+
+class TokenBucket:
+    """Refills continuously at `per_minute` units per minute, up to one minute's worth"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1):
+        amount = min(amount, self.capacity)
+        # Holding the lock while waiting keeps waiters in FIFO order
+        async with self.lock:
+            self._refill()
+            while self.available < amount:
+                await asyncio.sleep((amount - self.available) / self.rate)
+                self._refill()
+            self.available -= amount
+
+    def adjust(self, amount: float):
+        """Charge (or refund, if negative) the difference between an estimate and actual usage"""
+        self._refill()
+        self.available -= amount
+
+
+def estimate_tokens(request: dict) -> int:
+    """Rough prompt size (4 characters per token) used to reserve tokens before a request is sent"""
+    chars = 0
+    for message in request.get("messages", []):
+        if isinstance(message, dict):
+            chars += len(message.get("content") or "")
+            for tool_call in message.get("tool_calls") or ():
+                function = tool_call["function"]
+                chars += len(function.get("name") or "") + len(function.get("arguments") or "")
+        else:
+            chars += len(getattr(message, "content", None) or "")
+            for tool_call in getattr(message, "tool_calls", None) or ():
+                chars += len(tool_call.function.name or "") + len(tool_call.function.arguments or "")
+    for tool in request.get("tools") or []:
+        chars += len(tool["function"]["description"]) + 64
+    return chars // 4 + 1
+
+
+class CompletionCaller:
+    """
+    Sends chat completions through the shared client with rate limiting and retries. With a
+    cache, deterministic requests are answered from it before any rate limit is applied.
+    """
+
+    def __init__(self, client: AsyncAzureOpenAI, requests_per_minute: float = None,
+                 tokens_per_minute: float = None, max_retries: int = 6,
+                 backoff_base: float = 0.5, backoff_cap: float = 30.0, cache: CompletionCache = None):
+        self.client = client
+        self.cache = cache
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.retries = 0
+
+    def _should_retry(self, error: Exception) -> bool:
+        if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in RETRY_STATUS_CODES or error.status_code >= 500
+        return False
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            return max(delay, float(retry_after)) if retry_after else delay
+        except ValueError:
+            return delay
+
+    async def create(self, **request):
+        # The cache is SQLite shared between processes: a lookup updates last_used and a
+        # store waits for the write lock, so both run off the event loop
+        cache = self.cache if self.cache is not None and is_cacheable(request) else None
+        if cache is not None:
+            cached = await asyncio.to_thread(cache.get, request)
+            if cached is not None:
+                return cached
+        estimate = estimate_tokens(request)
+        for attempt in range(self.max_retries + 1):
+            if self.requests:
+                await self.requests.acquire()
+            if self.tokens:
+                await self.tokens.acquire(estimate)
+            try:
+                response = await self.client.chat.completions.create(**request)
+            except Exception as e:
+                if attempt == self.max_retries or not self._should_retry(e):
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt, e))
+                continue
+            usage = getattr(response, "usage", None)
+            if self.tokens and usage is not None:
+                self.tokens.adjust(usage.total_tokens - estimate)
+            if cache is not None:
+                await asyncio.to_thread(cache.put, request, response)
+            return response
+
+
+class AsyncAgent(Agent):
+    """
+    Agent whose model requests are awaited on the event loop. Tools still run synchronously
+    in a worker thread; a tool that needs the model (ask_artificial_intelligence) hands its
+    request back to the loop.
+    """
+
+    def __init__(self, completions: CompletionCaller, executor: ThreadPoolExecutor = None, verbose: bool = False,
+                 token_budget: int = None, stream: bool = False, tracer=None):
+        super().__init__(client=completions.client, verbose=verbose, token_budget=token_budget, stream=stream,
+                         tracer=tracer)
+        self.completions = completions
+        self.executor = executor
+        self.loop: asyncio.AbstractEventLoop = None
+        self.cancelled = False
+        self._requests: set[asyncio.Task] = set()
+
+    def fork(self) -> "AsyncAgent":
+        """A branch that cancels and waits on its own requests only"""
+        agent = super().fork()
+        agent.cancelled = False
+        agent._requests = set()
+        return agent
+
+    def create_completion(self, **kwargs):
+        future = asyncio.run_coroutine_threadsafe(self._tool_request(kwargs), self.loop)
+        with self.tracer.span("llm", model=kwargs.get("model")) as span:
+            response = future.result()
+            self._record_usage(response, span)
+        return response
+
+    async def _tool_request(self, request: dict):
+        """A request made by a tool from a worker thread, run on the loop where cancel() can reach it"""
+        if self.cancelled:
+            raise asyncio.CancelledError()
+        task = asyncio.current_task()
+        self._requests.add(task)
+        try:
+            return await self.completions.create(**request)
+        finally:
+            self._requests.discard(task)
+
+    def cancel(self):
+        """Cancel the requests tools are waiting on (ask_artificial_intelligence) and refuse new ones; call on the loop"""
+        self.cancelled = True
+        for task in list(self._requests):
+            task.cancel()
+
+    async def act_async(self):
+        self.loop = asyncio.get_running_loop()
+        if self.stream:
+            return await self._act_streaming_async()
+        started = time.perf_counter()
+        with self.tracer.span("llm", model=self.model) as span:
+            response = await self.completions.create(**self._completion_request())
+            self._record_usage(response, span)
+        message = response.choices[0].message
+        return await self._join(self.loop.run_in_executor(self.executor, self._handle_response, message, started))
+
+    async def _join(self, tools: asyncio.Future):
+        """
+        Wait for tools running in worker threads. Threads cannot be interrupted, so when
+        cancelled, unblock them by cancelling their requests and still wait for them to
+        finish, leaving the world consistent.
+        """
+        try:
+            return await asyncio.shield(tools)
+        except asyncio.CancelledError:
+            self.cancel()
+            await asyncio.gather(tools, return_exceptions=True)
+            raise
+
+    async def _act_streaming_async(self):
+        started = time.perf_counter()
+        self.time_to_first_action = None
+        assembler = StreamAssembler(on_text=self.on_text)
+        batch = ToolBatch(self.tool_executor())
+        try:
+            with self.tracer.span("llm", model=self.model, stream=True) as span:
+                async for chunk in await self.completions.create(**self._stream_request()):
+                    for tool_call in assembler.feed(chunk):
+                        self._dispatch_streamed(batch, tool_call, started)
+                for tool_call in assembler.finish():
+                    self._dispatch_streamed(batch, tool_call, started)
+                self._record_usage(assembler, span)
+                span.set(time_to_first_action=self.time_to_first_action)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+        finally:
+            # Wait on the loop rather than in a worker so running tools are not starved
+            await self._join(asyncio.gather(*(asyncio.wrap_future(future) for future in batch.futures),
+                                            return_exceptions=True))
+        return self._finish_streamed_turn(assembler, batch)
+
+
+@dataclass
+class EpisodeResult:
+    episode_id: int
+    solved: bool
+    turns: int
+    nudges: int
+    prompt_tokens: int
+    completion_tokens: int
+    duration: float
+    error: str = None
+    # Fewest moves that solve the puzzle divided by the moves made (see World.exploration_efficiency)
+    exploration_efficiency: float = None
+    # What ended the episode: solved, nudges, max_turns, max_tokens, deadline or error
+    stop_reason: str = None
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+@dataclass
+class EpisodeConfig:
+    max_nudges: int = 3
+    verbose: bool = False
+    token_budget: int = None
+    stream: bool = False
+    # Sampling overrides; temperature 0 or a seed make requests cacheable
+    temperature: float = None
+    seed: int = None
+    # Play on a generated world of this many locations instead of the two-room ship
+    world_size: int = None
+    world_seed: int = 0
+    # Checkpoint episodes into this directory and resume them from it
+    checkpoint_dir: str = None
+    # Budgets: turns, prompt + completion tokens, and seconds of wall-clock time per episode
+    max_turns: int = None
+    max_tokens: int = None
+    deadline: float = None
+
+
+class EpisodeBudget:
+    """Checks an episode against the turn, token and wall-clock budgets of its config"""
+
+    def __init__(self, config: EpisodeConfig):
+        self.max_turns = config.max_turns
+        self.max_tokens = config.max_tokens
+        self.deadline = time.monotonic() + config.deadline if config.deadline is not None else None
+
+    def remaining(self) -> float | None:
+        """Seconds left before the deadline, or None without one"""
+        return self.deadline - time.monotonic() if self.deadline is not None else None
+
+    def exceeded(self, turns: int, tokens: int) -> str | None:
+        """The budget that is used up, if any"""
+        if self.max_turns is not None and turns >= self.max_turns:
+            return "max_turns"
+        if self.max_tokens is not None and tokens >= self.max_tokens:
+            return "max_tokens"
+        if self.deadline is not None and self.remaining() <= 0:
+            return "deadline"
+        return None
+
+
+RUN_FILE = "run.json"
+MANIFEST_FILE = "manifest.jsonl"
+
+
+def checkpoint_path(directory: str, episode_id: int) -> str:
+    return os.path.join(directory, f"episode-{episode_id}.jsonl")
+
+
+def build_world(completions: CompletionCaller, config: EpisodeConfig, executor: ThreadPoolExecutor = None) -> World:
+    """A world and its agent ready to start an episode"""
+    agent = AsyncAgent(completions, executor=executor, verbose=config.verbose, token_budget=config.token_budget,
+                       stream=config.stream)
+    if config.temperature is not None:
+        agent.temperature = config.temperature
+    if config.seed is not None:
+        agent.seed = config.seed
+    if config.world_size:
+        world = create_large_world(agent, config.world_size, seed=config.world_seed)
+    else:
+        world = create_world(agent)
+    agent.messages = [
+        {"role": "system", "content": intern_content(system_prompt)},
+        {"role": "user", "content": intern_content(goal_prompt)},
+        {"role": "user", "content": intern_content(agent.current_location.description)}
+    ]
+    return world
+
+
+async def run_episode(completions: CompletionCaller, episode_id: int = 0, config: EpisodeConfig = None,
+                      executor: ThreadPoolExecutor = None, tracer=NULL_TRACER, pool: WorldPool = None) -> EpisodeResult:
+    """Play one episode, on a world from pool (returned to it afterwards) or a newly built one"""
+    config = config or EpisodeConfig()
+    verbose = config.verbose
+    world = pool.acquire() if pool is not None else build_world(completions, config, executor)
+    agent = world.agent
+    agent.tracer, agent.cancelled = tracer, False
+    turns = 0
+    checkpoint = None
+    if config.checkpoint_dir:
+        checkpoint = EpisodeCheckpoint(checkpoint_path(config.checkpoint_dir, episode_id))
+        turns = checkpoint.restore(world)
+        if turns:
+            tracer.event("resume", turn=turns)
+    loop = asyncio.get_running_loop()
+    budget = EpisodeBudget(config)
+    error = stop_reason = None
+    start = time.perf_counter()
+    try:
+        # Run agent loop until task is complete, nudges are exhausted or a budget runs out
+        while True:
+            # If task is complete, break
+            with tracer.span("completion_check", turn=turns) as span:
+                complete = world.check_for_completion()
+                span.set(complete=complete)
+            if complete:
+                stop_reason = "solved"
+                if verbose:
+                    print("Goal complete!")
+                break
+            if world.number_of_nudges >= config.max_nudges:
+                stop_reason = "nudges"
+                if verbose:
+                    print("Nudges exhausted!")
+                break
+            stop_reason = budget.exceeded(turns, agent.prompt_tokens + agent.completion_tokens)
+            if stop_reason:
+                break
+            # Let agent make a choice; at the deadline the request or tool call in flight is cancelled
+            try:
+                message = await asyncio.wait_for(agent.act_async(), budget.remaining())
+            except TimeoutError:
+                stop_reason = "deadline"
+                break
+            turns += 1
+            # Check if agent made a tool call
+            if not message.tool_calls:
+                if verbose:
+                    print("Pre-nudge message:", message.content)
+                # Nudge agent
+                agent.messages.extend([
+                    {"role": "assistant", "content": message.content},
+                    {"role": "user", "content": intern_content(nudge_prompt)},
+                ])
+                world.number_of_nudges += 1
+                tracer.event("nudge", turn=turns, nudges=world.number_of_nudges)
+            if checkpoint is not None:
+                # Capture the state between turns, write it off the loop
+                await loop.run_in_executor(executor, checkpoint.append, checkpoint.record(world, turns))
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        stop_reason = "error"
+    if stop_reason in ("max_turns", "max_tokens", "deadline"):
+        tracer.event("budget", reason=stop_reason, turn=turns)
+        if verbose:
+            print(f"Budget exhausted: {stop_reason}")
+    result = EpisodeResult(
+        episode_id=episode_id,
+        solved=world.check_for_completion(),
+        turns=turns,
+        nudges=world.number_of_nudges,
+        prompt_tokens=agent.prompt_tokens,
+        completion_tokens=agent.completion_tokens,
+        duration=time.perf_counter() - start,
+        error=error,
+        exploration_efficiency=world.exploration_efficiency() if world.check_for_completion() else None,
+        stop_reason=stop_reason,
+    )
+    tracer.event("episode", **asdict(result))
+    if pool is not None:
+        pool.release(world)
+    return result
+
+
+async def run_episodes(client: AsyncAzureOpenAI, episodes: int, concurrency: int = 50,
+                       requests_per_minute: float = None, tokens_per_minute: float = None,
+                       config: EpisodeConfig = None, tracer=NULL_TRACER, profiler: Callable = None,
+                       profile_episode: int = None, cache: CompletionCache = None,
+                       **options) -> list[EpisodeResult]:
+    """
+    Run independent episodes concurrently, at most `concurrency` at a time. Options not
+    given through config (max_nudges, verbose, ...) are passed on to EpisodeConfig.
+    profiler is a hook such as tracing.cprofile_hook(directory), applied to profile_episode.
+    With config.checkpoint_dir, episodes in its manifest are not run again and their
+    recorded results are returned instead.
+    """
+    config = config or EpisodeConfig(**options)
+    manifest, finished = None, {}
+    if config.checkpoint_dir:
+        os.makedirs(config.checkpoint_dir, exist_ok=True)
+        run_file = os.path.join(config.checkpoint_dir, RUN_FILE)
+        if not os.path.exists(run_file):
+            with open(run_file, "w") as f:
+                json.dump({"episodes": episodes, "config": asdict(config)}, f, indent=2)
+        manifest = RunManifest(os.path.join(config.checkpoint_dir, MANIFEST_FILE))
+        finished = manifest.completed()
+    completions = CompletionCaller(client, requests_per_minute, tokens_per_minute, cache=cache)
+    semaphore = asyncio.Semaphore(concurrency)
+    # Tools run off the event loop; one worker per in-flight episode is enough
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="episode-tools") as executor:
+        # Worlds are built once per concurrent episode and reset in place between episodes
+        pool = WorldPool(partial(build_world, completions, config, executor))
+        async def bounded(episode_id: int) -> EpisodeResult:
+            if episode_id in finished:
+                return EpisodeResult(**finished[episode_id])
+            async with semaphore:
+                episode = run_episode(completions, episode_id, config, executor, tracer.bind(episode=episode_id), pool)
+                if profiler is not None and episode_id == profile_episode:
+                    with profiler(episode_id):
+                        result = await episode
+                else:
+                    result = await episode
+            # Errored episodes stay out of the manifest so a rerun resumes them
+            if manifest is not None and result.error is None:
+                await asyncio.get_running_loop().run_in_executor(executor, manifest.add, asdict(result))
+            return result
+        return await asyncio.gather(*(bounded(i) for i in range(episodes)))
+
+
+async def evaluate(episodes: int = 1, concurrency: int = 50, client: AsyncAzureOpenAI = None,
+                   **kwargs) -> list[EpisodeResult]:
+    """Create the shared client, run the episodes and close the connection pool"""
+    client = client or create_async_client(max_connections=concurrency)
+    try:
+        return await run_episodes(client, episodes, concurrency, **kwargs)
+    finally:
+        await client.close()
+
+
+async def resume(checkpoint_dir: str, concurrency: int = 50, client: AsyncAzureOpenAI = None,
+                 **kwargs) -> list[EpisodeResult]:
+    """Continue the run checkpointed in checkpoint_dir with the episode count and config it started with"""
+    with open(os.path.join(checkpoint_dir, RUN_FILE)) as f:
+        run = json.load(f)
+    config = EpisodeConfig(**{**run["config"], "checkpoint_dir": checkpoint_dir})
+    return await evaluate(run["episodes"], concurrency, client, config=config, **kwargs)
+
+
+def summarize(results: list[EpisodeResult]) -> str:
+    solved = sum(result.solved for result in results)
+    errors = sum(result.error is not None for result in results)
+    turns = sum(result.turns for result in results) / max(len(results), 1)
+    tokens = sum(result.total_tokens for result in results)
+    budgets = Counter(result.stop_reason for result in results
+                      if result.stop_reason in ("max_turns", "max_tokens", "deadline"))
+    stopped = "".join(f", {count} stopped by {reason}" for reason, count in sorted(budgets.items()))
+    return (f"{solved}/{len(results)} solved, {errors} errored{stopped}, "
+            f"{turns:.1f} turns per episode, {tokens} tokens total")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--episodes", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rpm", type=float, default=None, help="requests per minute")
+    parser.add_argument("--tpm", type=float, default=None, help="tokens per minute")
+    parser.add_argument("--max-nudges", type=int, default=3)
+    parser.add_argument("--token-budget", type=int, default=None, help="compact each episode's context above this size")
+    parser.add_argument("--stream", action="store_true", help="stream completions and dispatch tools early")
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--trace", help="write spans to this JSONL file")
+    parser.add_argument("--metrics", action="store_true", help="print latency percentiles and tokens per episode")
+    parser.add_argument("--profile-episode", type=int, default=None, help="profile this episode with cProfile")
+    parser.add_argument("--profile-dir", default="profiles")
+    parser.add_argument("--cache", help="answer deterministic requests from this completion cache file")
+    parser.add_argument("--cache-mb", type=float, default=256, help="evict least recently used entries above this size")
+    parser.add_argument("--temperature", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--world-size", type=int, default=None, help="play on a generated world of this many locations")
+    parser.add_argument("--world-seed", type=int, default=0)
+    parser.add_argument("--max-turns", type=int, default=None, help="end an episode after this many turns")
+    parser.add_argument("--max-tokens", type=int, default=None, help="end an episode after this many tokens")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="end an episode after this many seconds, cancelling the request in flight")
+    parser.add_argument("--checkpoint-dir", help="checkpoint every turn and record finished episodes here")
+    parser.add_argument("--resume", metavar="DIR", help="continue the checkpointed run in DIR with its settings")
+    args = parser.parse_args()
+
+    cache = CompletionCache(args.cache, max_bytes=int(args.cache_mb * 1024 * 1024)) if args.cache else None
+    tracer = NULL_TRACER
+    if args.trace or args.metrics:
+        tracer = Tracer(JsonlSink(args.trace) if args.trace else None, Metrics() if args.metrics else None)
+    options = dict(
+        requests_per_minute=args.rpm, tokens_per_minute=args.tpm, tracer=tracer,
+        profiler=cprofile_hook(args.profile_dir) if args.profile_episode is not None else None,
+        profile_episode=args.profile_episode, cache=cache,
+    )
+    try:
+        if args.resume:
+            results = asyncio.run(resume(args.resume, args.concurrency, **options))
+        else:
+            results = asyncio.run(evaluate(
+                episodes=args.episodes, concurrency=args.concurrency,
+                max_nudges=args.max_nudges, verbose=args.verbose, token_budget=args.token_budget,
+                stream=args.stream, temperature=args.temperature, seed=args.seed,
+                world_size=args.world_size, world_seed=args.world_seed,
+                max_turns=args.max_turns, max_tokens=args.max_tokens, deadline=args.deadline,
+                checkpoint_dir=args.checkpoint_dir, **options,
+            ))
+    finally:
+        if tracer.enabled:
+            tracer.close()
+    for result in results:
+        print(json.dumps(asdict(result)))
+    print(summarize(results))
+    if args.metrics:
+        print(tracer.metrics.format())
+    if cache is not None:
+        print("cache:", json.dumps(cache.stats()))
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
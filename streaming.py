@@ -0,0 +1,89 @@
+import json
+from typing import Callable
+
+from messages import Function, Message, ToolCall, intern_content
+
+
+class StreamAssembler:
+    """
+    Rebuilds an assistant message from streamed chat.completion.chunk deltas.
+
+    feed() returns the tool calls whose JSON arguments became complete with that chunk, in
+    call order, so they can be dispatched while the rest of the message is still streaming.
+    Text deltas are passed to on_text as they arrive.
+    """
+
+    def __init__(self, on_text: Callable[[str], None] = None):
+        self.on_text = on_text
+        self.content: list[str] = []
+        self.tool_calls: list[dict] = []
+        self.dispatched = 0
+        self.usage = None
+
+    def feed(self, chunk) -> list[dict]:
+        if getattr(chunk, "usage", None) is not None:
+            self.usage = chunk.usage
+        for choice in chunk.choices or []:
+            delta = choice.delta
+            if delta.content:
+                self.content.append(delta.content)
+                if self.on_text:
+                    self.on_text(delta.content)
+            for tool_call_delta in delta.tool_calls or []:
+                while len(self.tool_calls) <= tool_call_delta.index:
+                    self.tool_calls.append({"id": None, "name": "", "arguments": []})
+                tool_call = self.tool_calls[tool_call_delta.index]
+                if tool_call_delta.id:
+                    tool_call["id"] = tool_call_delta.id
+                function = tool_call_delta.function
+                if function is not None:
+                    tool_call["name"] += function.name or ""
+                    if function.arguments:
+                        tool_call["arguments"].append(function.arguments)
+        return self._ready()
+
+    def _ready(self) -> list[dict]:
+        """Tool calls, in order, whose arguments now parse as a complete JSON object"""
+        ready = []
+        while self.dispatched < len(self.tool_calls):
+            tool_call = self.tool_calls[self.dispatched]
+            # A later call has started, so this one is finished even if its arguments are malformed
+            finished = self.dispatched + 1 < len(self.tool_calls)
+            if not finished and not self._arguments_complete(tool_call):
+                break
+            ready.append(tool_call)
+            self.dispatched += 1
+        return ready
+
+    @staticmethod
+    def _arguments_complete(tool_call: dict) -> bool:
+        if not tool_call["name"] or not tool_call["arguments"]:
+            return False
+        arguments = "".join(tool_call["arguments"]).strip()
+        if not arguments.endswith("}"):
+            return False
+        try:
+            return isinstance(json.loads(arguments), dict)
+        except json.JSONDecodeError:
+            return False
+
+    def finish(self) -> list[dict]:
+        """Tool calls not yet handed out, once the stream has ended"""
+        remaining = self.tool_calls[self.dispatched:]
+        self.dispatched = len(self.tool_calls)
+        return remaining
+
+    def message(self) -> Message:
+        """The assistant message, as Context stores the non-streaming response"""
+        return Message(
+            "assistant",
+            "".join(self.content) if self.content else None,
+            tuple(assembled_tool_call(tool_call) for tool_call in self.tool_calls) or None,
+            in_transcript=False,
+        )
+
+
+def assembled_tool_call(tool_call: dict) -> ToolCall:
+    """The ToolCall for a call assembled from stream deltas (arguments as a list of fragments)"""
+    return ToolCall(intern_content(tool_call["id"]), Function(intern_content(tool_call["name"]),
+                                                              "".join(tool_call["arguments"])))
@@ -0,0 +1,77 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from actions import ToolBatch
+
+
+class Recorder:
+    """Calls that log when they start and finish, to check what overlapped"""
+
+    def __init__(self):
+        self.events = []
+        self.lock = threading.Lock()
+
+    def call(self, name: str, seconds: float = 0.02):
+        def run():
+            with self.lock:
+                self.events.append(("start", name))
+            time.sleep(seconds)
+            with self.lock:
+                self.events.append(("end", name))
+            return name
+        return run
+
+    def index(self, event: str, name: str) -> int:
+        return self.events.index((event, name))
+
+
+@pytest.mark.parametrize("workers", [1, 2, 8])
+def test_tool_batch_keeps_call_order_around_a_mutating_call(workers):
+    recorder = Recorder()
+    calls = [("read1", True), ("read2", True), ("write", False), ("read3", True), ("read4", True)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        batch = ToolBatch(executor)
+        for name, read_only in calls:
+            batch.submit(recorder.call(name), read_only)
+        results = [result for result, _ in batch.results()]
+    assert results == [name for name, _ in calls]
+    # The mutating call starts after every earlier call ends, and later calls start after it ends
+    assert recorder.index("start", "write") > max(recorder.index("end", "read1"), recorder.index("end", "read2"))
+    assert recorder.index("end", "write") < min(recorder.index("start", "read3"), recorder.index("start", "read4"))
+
+
+def test_tool_batch_runs_read_only_calls_concurrently():
+    recorder = Recorder()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        batch = ToolBatch(executor)
+        start = time.perf_counter()
+        for name in ("a", "b", "c", "d"):
+            batch.submit(recorder.call(name, 0.1), True)
+        batch.results()
+        assert time.perf_counter() - start < 0.3
+
+
+def test_tool_batch_does_not_block_workers_on_dependencies():
+    # With one worker, a call that waited inside the pool for an earlier one would deadlock
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        batch = ToolBatch(executor)
+        for i in range(20):
+            batch.submit(lambda i=i: i, i % 3 == 0)
+        assert [result for result, _ in batch.results()] == list(range(20))
+
+
+def test_tool_batch_reports_errors_and_keeps_going():
+    def fail():
+        raise RuntimeError("boom")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        batch = ToolBatch(executor)
+        batch.submit(fail, False)
+        later = batch.submit(lambda: "after", True)
+        with pytest.raises(RuntimeError, match="boom"):
+            batch.results()
+        assert later.result()[0] == "after"
+
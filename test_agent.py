@@ -0,0 +1,60 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from Agent import Agent
+from World import create_world
+from bench import StubClient
+from fake_server import ScriptedSolver
+from runner import CompletionCaller, EpisodeConfig, build_world
+
+
+def test_agents_have_their_own_tool_pools():
+    first, second = Agent(client=None, verbose=False), Agent(client=None, verbose=False)
+    assert first.tool_executor() is first.tool_executor()
+    assert first.tool_executor() is not second.tool_executor()
+
+
+def test_concurrent_usage_is_counted_once_each():
+    agent = Agent(client=None, verbose=False)
+    response = SimpleNamespace(usage=SimpleNamespace(prompt_tokens=3, completion_tokens=1))
+
+    def record():
+        for _ in range(10_000):
+            agent._record_usage(response)
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert (agent.prompt_tokens, agent.completion_tokens) == (240_000, 80_000)
+
+
+def test_fork_gets_its_own_pool_and_lock():
+    world = create_world(Agent(client=None, verbose=False))
+    agent = world.agent
+    agent.messages = [{"role": "system", "content": "system"}]
+    agent.tool_executor()
+    branch = world.fork().agent
+    assert branch.lock is not agent.lock
+    assert branch.tool_executor() is not agent.tool_executor()
+
+
+def test_async_agent_fork_cancels_only_its_own_requests():
+    async def main():
+        world = build_world(CompletionCaller(StubClient(ScriptedSolver())), EpisodeConfig())
+        parent = world.agent
+        branch = world.fork().agent
+        assert branch._requests is not parent._requests
+        parent_request = asyncio.ensure_future(asyncio.sleep(10))
+        branch_request = asyncio.ensure_future(asyncio.sleep(10))
+        parent._requests.add(parent_request)
+        branch._requests.add(branch_request)
+        branch.cancel()
+        await asyncio.sleep(0)
+        assert branch.cancelled and branch_request.cancelled()
+        assert not parent.cancelled and not parent_request.done()
+        parent_request.cancel()
+
+    asyncio.run(main())
@@ -0,0 +1,54 @@
+from openai.types.chat import ChatCompletion
+
+from cache import CompletionCache
+
+
+def completion(text: str) -> ChatCompletion:
+    return ChatCompletion.model_validate({
+        "id": "chatcmpl-0", "object": "chat.completion", "created": 0, "model": "gpt-4o",
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": text}}],
+    })
+
+
+def request(number: int) -> dict:
+    return {"model": "gpt-4o", "temperature": 0, "messages": [{"role": "user", "content": str(number)}]}
+
+
+def fill(cache: CompletionCache, count: int, text: str = "x" * 1000):
+    for number in range(count):
+        cache.put(request(number), completion(text))
+
+
+def test_put_keeps_the_cache_within_budget(tmp_path):
+    cache = CompletionCache(str(tmp_path / "cache.db"), max_bytes=20_000)
+    fill(cache, 100)
+    stats = cache.stats()
+    assert stats["bytes"] <= 20_000
+    assert stats["evictions"] == 100 - stats["entries"]
+    assert cache.get(request(99)) is not None
+    assert cache.get(request(0)) is None
+
+
+def test_entry_larger_than_the_budget_is_not_stored(tmp_path):
+    cache = CompletionCache(str(tmp_path / "cache.db"), max_bytes=20_000)
+    fill(cache, 5)
+    cache.put(request(1000), completion("x" * 30_000))
+    assert cache.get(request(1000)) is None
+    assert cache.stats()["entries"] == 5
+    assert cache.stats()["evictions"] == 0
+
+
+def test_opening_evicts_down_to_the_budget(tmp_path):
+    path = str(tmp_path / "cache.db")
+    large = CompletionCache(path, max_bytes=1_000_000)
+    fill(large, 100)
+    assert large.stats()["evictions"] == 0
+
+    small = CompletionCache(path, max_bytes=20_000)
+    stats = small.stats()
+    assert stats["bytes"] <= 20_000
+    assert stats["evictions"] == 100 - stats["entries"] > 0
+    assert large.stats()["entries"] == stats["entries"]
+    large.close()
+    small.close()
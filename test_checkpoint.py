@@ -0,0 +1,78 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from bench import StubClient
+from checkpoint import EpisodeCheckpoint, read_jsonl
+from fake_server import RandomToolCaller, ScriptedSolver
+from runner import MANIFEST_FILE, CompletionCaller, EpisodeConfig, build_world, checkpoint_path, evaluate, resume
+
+
+def final_state(directory: str, episode_id: int, config: EpisodeConfig):
+    """The messages and world state an episode's checkpoint restores to"""
+    world = build_world(CompletionCaller(StubClient(ScriptedSolver())), config)
+    turn = EpisodeCheckpoint(checkpoint_path(directory, episode_id)).restore(world)
+    state = world.snapshot()
+    return turn, [message.to_dict() for message in state.agent.messages], state.locations, state.path
+
+
+def manifest_ids(directory: str) -> list[int]:
+    return sorted(record["episode_id"] for record in read_jsonl(os.path.join(directory, MANIFEST_FILE)))
+
+
+def test_episode_history_restores_into_a_fresh_world(tmp_path):
+    directory = str(tmp_path)
+    results = asyncio.run(evaluate(episodes=1, concurrency=1, client=StubClient(ScriptedSolver()),
+                                   checkpoint_dir=directory))
+    turn, messages, locations, path = final_state(directory, 0, EpisodeConfig())
+    assert results[0].solved and turn == results[0].turns
+    assert locations["control_room"][-1] is True  # navigation_system_activated
+    assert path[-1] == "control_room"
+    assert messages[0]["role"] == "system" and messages[-1]["role"] == "tool"
+
+
+@pytest.mark.parametrize("policy, token_budget", [
+    (lambda: ScriptedSolver(), None),
+    (lambda: ScriptedSolver(), 600),  # compaction rewrites the history mid-episode
+    (lambda: RandomToolCaller(seed=3, text_probability=0.3), None),
+])
+def test_interrupted_episode_resumes_with_the_same_history(tmp_path, policy, token_budget):
+    complete, interrupted = str(tmp_path / "complete"), str(tmp_path / "interrupted")
+    config = EpisodeConfig(token_budget=token_budget, max_turns=30)
+    for directory in (complete, interrupted):
+        asyncio.run(evaluate(episodes=2, concurrency=2, client=StubClient(policy()),
+                             checkpoint_dir=directory, token_budget=token_budget, max_turns=30))
+    expected = final_state(complete, 1, config)
+
+    # Kill episode 1 halfway: keep half its records plus a torn line, and drop it from the manifest
+    path = checkpoint_path(interrupted, 1)
+    with open(path) as f:
+        lines = f.readlines()
+    with open(path, "w") as f:
+        f.write("".join(lines[:len(lines) // 2]) + lines[len(lines) // 2][:40])
+    manifest = os.path.join(interrupted, MANIFEST_FILE)
+    with open(manifest) as f:
+        kept = [line for line in f if json.loads(line)["episode_id"] != 1]
+    with open(manifest, "w") as f:
+        f.write("".join(kept))
+
+    client = StubClient(policy())
+    results = asyncio.run(resume(interrupted, client=client))
+    # Only the second half of episode 1 is played again
+    assert 0 < client.requests <= len(lines) - len(lines) // 2 + 1
+    assert final_state(interrupted, 1, config) == expected
+    assert [result.episode_id for result in results] == [0, 1]
+    assert manifest_ids(interrupted) == [0, 1]
+
+
+def test_finished_episodes_are_not_run_again(tmp_path):
+    directory = str(tmp_path)
+    first = asyncio.run(evaluate(episodes=3, concurrency=3, client=StubClient(ScriptedSolver()),
+                                 checkpoint_dir=directory))
+    client = StubClient(ScriptedSolver())
+    again = asyncio.run(resume(directory, client=client))
+    assert client.requests == 0
+    assert [result.solved for result in again] == [result.solved for result in first] == [True] * 3
+    assert manifest_ids(directory) == [0, 1, 2]
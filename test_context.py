@@ -0,0 +1,90 @@
+import asyncio
+import json
+
+import pytest
+
+from bench import StubClient
+from context import SUMMARY_PREFIX, Context
+from fake_server import ScriptedSolver
+from prompts import goal_prompt, system_prompt
+from runner import evaluate
+
+
+def assert_valid(context: Context):
+    """Every tool message answers a call of the assistant message before it, and every call is answered"""
+    open_calls = set()
+    for message in context:
+        if message.role == "tool":
+            assert message.tool_call_id in open_calls
+            open_calls.discard(message.tool_call_id)
+        else:
+            assert not open_calls, f"unanswered tool calls {open_calls}"
+            open_calls = {tool_call.id for tool_call in message.tool_calls or ()}
+    assert not open_calls
+
+
+def play(context: Context, turns: int, output_chars: int = 2000):
+    """Append turns of one tool call each, with long and partly repeated tool output"""
+    for turn in range(turns):
+        call_id = f"call_{turn}"
+        context.append({"role": "assistant", "content": None, "tool_calls": [{
+            "id": call_id, "type": "function",
+            "function": {"name": "check_logs", "arguments": json.dumps({"page": turn % 3 + 1})}}]})
+        context.append({"role": "tool", "tool_call_id": call_id,
+                        "content": f"page {turn % 3}\n" + "log line " * (output_chars // 9)})
+
+
+def opening(budget: int, **kwargs) -> Context:
+    return Context([{"role": "system", "content": system_prompt}, {"role": "user", "content": goal_prompt}],
+                   budget=budget, **kwargs)
+
+
+@pytest.mark.parametrize("keep_recent", [0, 1, 8])
+def test_compaction_keeps_tool_calls_paired_and_respects_the_budget(keep_recent):
+    context = opening(4000, keep_recent=keep_recent)
+    play(context, 60)
+    assert context.compactions > 0
+    assert_valid(context)
+    # The opening prompts are never compacted, and the rest stays within the budget
+    assert [message.content for message in context][:2] == [system_prompt, goal_prompt]
+    assert context.total_tokens <= context.budget
+    assert context.total_tokens == sum(context._prefix_tokens) + sum(context._tokens)
+
+
+def test_compaction_folds_old_turns_into_one_summary():
+    context = opening(3000)
+    play(context, 200, output_chars=200)
+    summaries = [message for message in context if (message.content or "").startswith(SUMMARY_PREFIX)]
+    assert len(summaries) == 1
+    assert_valid(context)
+
+
+def test_budget_below_the_opening_prompts_does_not_compact_them():
+    context = opening(100)
+    assert context.compactions == 0
+    context.append({"role": "assistant", "content": "reply " * 100})
+    context.append({"role": "user", "content": "nudge"})
+    assert [message.content for message in context][:2] == [system_prompt, goal_prompt]
+
+
+def test_nothing_kept_recent_with_only_a_reply():
+    context = Context([{"role": "system", "content": "system " * 200}], budget=100, keep_recent=0)
+    context.extend([{"role": "assistant", "content": "reply " * 100}, {"role": "user", "content": "nudge"}])
+    assert_valid(context)
+
+
+def test_compacting_a_fork_leaves_the_parent_alone():
+    parent = opening(4000)
+    play(parent, 3)
+    before = [message.to_dict() for message in parent]
+    branch = parent.fork()
+    play(branch, 60)
+    assert branch.compactions > 0
+    assert [message.to_dict() for message in parent] == before
+    assert_valid(branch)
+
+
+def test_episodes_run_with_a_budget_below_the_opening_prompts():
+    results = asyncio.run(evaluate(episodes=2, concurrency=2, client=StubClient(ScriptedSolver()),
+                                   token_budget=100))
+    assert [result.error for result in results] == [None, None]
@@ -0,0 +1,89 @@
+import time
+
+import pytest
+
+from Agent import Agent
+from World import create_world
+from database import (MANIFEST_PATH, QueryBudgetExceeded, QueryNotAllowed, CrewDatabase, encode_results)
+
+RUNAWAY = "WITH RECURSIVE r(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM r) SELECT count(*) FROM r"
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = CrewDatabase(MANIFEST_PATH, db_path=str(tmp_path / "crew.db"))
+    yield database
+    database.close()
+
+
+def run(database: CrewDatabase, sql: str, **budget) -> str:
+    with database.guarded(**budget) as guard:
+        cursor = guard.execute(sql)
+        return encode_results(cursor, max_rows=None if guard.schema_only else 5)
+
+
+def still_works(database: CrewDatabase):
+    assert run(database, "SELECT first_name FROM crew WHERE last_name = 'Stern'") == "first_name\nRobert\n(1 row)"
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM crew",
+    "INSERT INTO crew (first_name) VALUES ('Eve')",
+    "DROP TABLE crew",
+    "CREATE TABLE notes (text TEXT)",
+    "ATTACH DATABASE ':memory:' AS other",
+    "PRAGMA query_only=OFF",
+    "SELECT printf('%.*c', 400000000, 'x')",
+    "SELECT format('%d', 1)",
+])
+def test_writes_and_denied_functions_are_refused(database, sql):
+    with pytest.raises(QueryNotAllowed, match="only reading queries are allowed"):
+        run(database, sql)
+    still_works(database)
+
+
+def test_runaway_query_is_stopped_by_the_step_budget(database):
+    with pytest.raises(QueryBudgetExceeded, match="stopped after 100000 steps"):
+        run(database, RUNAWAY, max_steps=100_000)
+    still_works(database)
+
+
+def test_runaway_query_is_stopped_by_the_time_budget(database):
+    start = time.monotonic()
+    with pytest.raises(QueryBudgetExceeded, match="stopped after 0.2 seconds"):
+        run(database, RUNAWAY, max_seconds=0.2, max_steps=10 ** 12)
+    assert time.monotonic() - start < 1
+    still_works(database)
+
+
+def test_oversized_values_are_refused(database):
+    with pytest.raises(QueryBudgetExceeded, match="a value grew past"):
+        run(database, "SELECT length(randomblob(400000000))")
+    still_works(database)
+
+
+def test_rows_are_capped_unless_only_the_schema_is_read(database):
+    assert run(database, "SELECT * FROM crew").endswith(
+        "[Truncated at 5 rows: showing 5 of 18 rows. Add a WHERE clause or use LIMIT and OFFSET to page.]")
+    assert "[Truncated at 5 rows: showing 5 of 7 rows." in run(database, "VALUES (1), (2), (3), (4), (5), (6), (7)")
+    assert "[Truncated at 5 rows: showing 5 of at least" in run(
+        database, "WITH RECURSIVE r(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM r) SELECT n FROM r")
+    assert run(database, "PRAGMA table_info(crew)").endswith("(8 rows)")
+    # Cached statements skip the authorizer, so a repeat must be capped the same way
+    assert "Truncated at 5 rows" in run(database, "VALUES (1), (2), (3), (4), (5), (6), (7)")
+    assert run(database, "PRAGMA table_info(crew)").endswith("(8 rows)")
+
+
+def test_results_are_truncated_at_the_byte_budget(database):
+    result = run(database, "SELECT hex(zeroblob(1500)) AS blob FROM crew")
+    assert result.splitlines()[-1] == (
+        "[Truncated at 4096 bytes: showing 1 of 18 rows. Select fewer columns or add a WHERE clause.]")
+    still_works(database)
+
+
+def test_use_database_returns_errors_as_text():
+    world = create_world(Agent(client=None, verbose=False))
+    control_room = world.locations["control_room"]
+    assert control_room.use_database("DROP TABLE crew").startswith(
+        "Error executing query: only reading queries are allowed")
+    assert "Robert\tStern" in control_room.use_database("SELECT * FROM crew WHERE role = 'Captain'")
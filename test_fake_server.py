@@ -0,0 +1,70 @@
+import http.client
+import json
+from urllib.parse import urlsplit
+
+import openai
+import pytest
+from openai import AzureOpenAI
+
+from fake_server import FakeServer, ScriptedSolver
+from runner import API_VERSION
+
+PATH = "/openai/deployments/gpt-4o/chat/completions"
+TOOLS = [{"type": "function", "function": {"name": "think", "description": "", "parameters": {}}}]
+
+
+@pytest.fixture
+def server():
+    with FakeServer(ScriptedSolver()) as server:
+        yield server
+
+
+def post(server: FakeServer, body: bytes) -> tuple[int, dict]:
+    url = urlsplit(server.url)
+    connection = http.client.HTTPConnection(url.hostname, url.port, timeout=5)
+    try:
+        connection.request("POST", PATH, body=body, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+@pytest.mark.parametrize("body, code", [
+    (b"{not json", "invalid_json"),
+    (b"[1, 2]", "invalid_request"),
+    (b'{"messages": "hello"}', "invalid_request"),
+])
+def test_bad_requests_get_a_400(server, body, code):
+    status, payload = post(server, body)
+    assert (status, payload["error"]["code"]) == (400, code)
+
+
+def test_policy_failure_gets_a_500_with_the_error(server):
+    foreign = {"messages": [{"role": "assistant", "content": None, "tool_calls": [{
+        "id": "tool-abc", "type": "function", "function": {"name": "think", "arguments": "{}"}}]}],
+        "tools": TOOLS}
+    status, payload = post(server, json.dumps(foreign).encode())
+    assert status == 500
+    assert payload["error"]["code"] == "policy_error"
+    assert payload["error"]["message"].startswith("ScriptedSolver failed: IndexError")
+
+    client = AzureOpenAI(azure_endpoint=server.url, api_key="fake", api_version=API_VERSION, max_retries=0)
+    with pytest.raises(openai.InternalServerError, match="ScriptedSolver failed"):
+        client.chat.completions.create(model="gpt-4o", tools=TOOLS, **{"messages": foreign["messages"]})
+    # The server keeps serving after a failure
+    response = client.chat.completions.create(model="gpt-4o", tools=TOOLS,
+                                              messages=[{"role": "user", "content": "start"}])
+    assert response.choices[0].message.tool_calls[0].function.name == "think"
+
+
+def test_malformed_http_gets_a_400(server):
+    url = urlsplit(server.url)
+    connection = http.client.HTTPConnection(url.hostname, url.port, timeout=5)
+    connection.putrequest("POST", PATH)
+    connection.putheader("Content-Length", "lots")
+    connection.endheaders()
+    response = connection.getresponse()
+    assert response.status == 400
+    assert json.loads(response.read())["error"]["code"] == "bad_request"
+    connection.close()
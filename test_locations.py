@@ -0,0 +1,41 @@
+from Agent import Agent
+from World import create_world
+
+
+def engine_room():
+    world = create_world(Agent(client=None, verbose=False))
+    return world.locations["engine_room"]
+
+
+def test_check_logs_without_arguments_summarizes():
+    assert engine_room().check_logs().startswith("22 log entries from")
+
+
+def test_check_logs_pages_without_filters():
+    room = engine_room()
+    first = room.check_logs(page=1)
+    assert first.startswith("Log entries 1-20 of 22 matching no filters:")
+    assert first.endswith("Use page=2 for more.")
+    second = room.check_logs(page=2)
+    assert second.startswith("Log entries 21-22 of 22 matching no filters:")
+    assert "for more" not in second
+    assert room.check_logs(page=3) == "Page 3 is past the last of 22 matching entries."
+    assert room.check_logs(page=0) == "Error: page must be 1 or more, not 0."
+
+
+def test_check_logs_pages_with_filters():
+    room = engine_room()
+    first = room.check_logs(level="INFO")
+    assert first.startswith("Log entries 1-18 of 18 matching level=INFO:")
+    assert room.check_logs(level="INFO", page=1) == first
+    assert room.check_logs(level="INFO", page=2) == "Page 2 is past the last of 18 matching entries."
+    assert room.check_logs(level="INFO", page=0) == "Error: page must be 1 or more, not 0."
+    assert room.check_logs(level="INFO", page=-3) == "Error: page must be 1 or more, not -3."
+
+
+def test_check_logs_null_page_is_omitted():
+    room = engine_room()
+    action = type(room).actions["check_logs"]
+    assert action.bind_arguments({"page": None}) == {}
+    assert room.check_logs(**action.bind_arguments({"level": "ERROR", "page": None})).startswith(
+        "Log entries 1-2 of 2 matching level=ERROR:")
@@ -0,0 +1,42 @@
+import json
+import sys
+
+from bench import StubClient
+from fake_server import ScriptedSolver
+from messages import intern_content, to_message
+from prompts import system_prompt
+from runner import CompletionCaller, EpisodeConfig, build_world
+
+
+def fresh(text: str) -> str:
+    # A copy that is not the same object, as a parsed API response would give
+    return json.loads(json.dumps(text))
+
+
+def test_free_text_is_not_interned():
+    output = "id | name\n1 | unique query result"
+    first = to_message({"role": "tool", "content": fresh(output), "tool_call_id": "call_1"})
+    second = to_message({"role": "tool", "content": fresh(output), "tool_call_id": "call_1"})
+    assert first.content == second.content
+    assert first.content is not second.content
+
+
+def test_roles_names_and_ids_are_interned():
+    arguments = fresh('{"query": "SELECT 1"}')
+    message = to_message({"role": fresh("assistant"), "content": None, "tool_calls": [
+        {"id": fresh("call_1"), "type": "function", "function": {"name": fresh("use_database"), "arguments": arguments}},
+    ]})
+    tool_call = message.tool_calls[0]
+    assert message.role is sys.intern("assistant")
+    assert tool_call.id is sys.intern("call_1")
+    assert tool_call.function.name is sys.intern("use_database")
+    assert tool_call.function.arguments is arguments
+    result = to_message({"role": "tool", "content": "1", "tool_call_id": fresh("call_1")})
+    assert result.tool_call_id is tool_call.id
+
+
+def test_build_world_interns_prompts_and_description():
+    messages = build_world(CompletionCaller(StubClient(ScriptedSolver())), EpisodeConfig()).agent.messages
+    assert messages[0].content is intern_content(system_prompt)
+    for message in messages:
+        assert message.content is intern_content(fresh(message.content))
@@ -0,0 +1,21 @@
+from types import SimpleNamespace
+
+from context import Context
+from runner import estimate_tokens
+
+ARGUMENTS = '{"query": "SELECT * FROM crew WHERE first_name = \'Robert\' AND last_name = \'Stern\'"}'
+
+
+def test_estimate_counts_tool_call_arguments_of_dict_messages():
+    messages = Context([{"role": "assistant", "content": None, "tool_calls": [{
+        "id": "call_0", "type": "function", "function": {"name": "use_database", "arguments": ARGUMENTS}}]}])
+    dicts = messages.to_dicts()
+    assert estimate_tokens({"messages": dicts}) == (len("use_database") + len(ARGUMENTS)) // 4 + 1
+
+
+def test_estimate_is_the_same_for_sdk_messages_and_dicts():
+    call = SimpleNamespace(id="call_0", function=SimpleNamespace(name="use_database", arguments=ARGUMENTS))
+    sdk = SimpleNamespace(role="assistant", content="Looking him up.", tool_calls=[call])
+    wire = {"role": "assistant", "content": "Looking him up.", "tool_calls": [{
+        "id": "call_0", "type": "function", "function": {"name": "use_database", "arguments": ARGUMENTS}}]}
+    assert estimate_tokens({"messages": [sdk]}) == estimate_tokens({"messages": [wire]})
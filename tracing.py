@@ -0,0 +1,220 @@
+"""
+Structured tracing for the agent loop.
+
+A Tracer records spans (LLM requests, tool calls, completion checks) and events (nudges)
+as flat dicts. Records go to a buffered JSONL sink and, optionally, to an in-process
+Metrics aggregator. Agents default to NULL_TRACER, whose spans do nothing, so the
+instrumented code paths cost one method call when tracing is off.
+"""
+from __future__ import annotations
+
+import cProfile
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable
+
+
+class Span:
+    __slots__ = ("tracer", "kind", "fields", "start")
+
+    def __init__(self, tracer: Tracer, kind: str, fields: dict):
+        self.tracer = tracer
+        self.kind = kind
+        self.fields = fields
+        self.start = 0.0
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def __enter__(self) -> Span:
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.fields["error"] = exc_type.__name__
+        self.tracer.emit(self.kind, duration=duration, **self.fields)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **fields):
+        pass
+
+    def __enter__(self) -> _NullSpan:
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class NullTracer:
+    """Tracer that records nothing"""
+    enabled = False
+    _span = _NullSpan()
+
+    def span(self, kind: str, **fields) -> _NullSpan:
+        return self._span
+
+    def event(self, kind: str, **fields):
+        pass
+
+    def emit(self, kind: str, **fields):
+        pass
+
+    def bind(self, **fields) -> NullTracer:
+        return self
+
+
+NULL_TRACER = NullTracer()
+
+
+class JsonlSink:
+    """Appends records to a JSON lines file, buffering them and writing in batches"""
+
+    def __init__(self, path: str, buffer_size: int = 1000):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.buffer: list[str] = []
+        self.lock = threading.Lock()
+        self.file = open(path, "a")
+
+    def write(self, record: dict):
+        line = json.dumps(record, default=str)
+        with self.lock:
+            self.buffer.append(line)
+            if len(self.buffer) >= self.buffer_size:
+                self._flush()
+
+    def _flush(self):
+        if self.buffer:
+            self.file.write("\n".join(self.buffer) + "\n")
+            self.buffer.clear()
+        self.file.flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            self.file.close()
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class Metrics:
+    """Aggregates trace records in process: latency percentiles per tool and tokens per episode"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.durations: dict[str, list[float]] = defaultdict(list)
+        self.episode_tokens: dict = defaultdict(int)
+        self.counts: dict[str, int] = defaultdict(int)
+
+    def record(self, record: dict):
+        kind = record["kind"]
+        with self.lock:
+            self.counts[kind] += 1
+            if kind == "tool":
+                self.durations[f"tool:{record['name']}"].append(record["duration"])
+            elif kind == "llm":
+                self.durations[f"llm:{record.get('model')}"].append(record["duration"])
+                self.episode_tokens[record.get("episode")] += (
+                    record.get("prompt_tokens", 0) + record.get("completion_tokens", 0))
+
+    def summary(self) -> dict:
+        with self.lock:
+            latencies = {
+                name: {
+                    "count": len(values),
+                    "p50": _percentile(values, 0.5),
+                    "p95": _percentile(values, 0.95),
+                }
+                for name, values in sorted(self.durations.items())
+            }
+            tokens = list(self.episode_tokens.values())
+            return {
+                "counts": dict(self.counts),
+                "latency": latencies,
+                "tokens_per_episode": {
+                    "episodes": len(tokens),
+                    "mean": sum(tokens) / len(tokens),
+                    "p50": _percentile(tokens, 0.5),
+                    "p95": _percentile(tokens, 0.95),
+                } if tokens else {},
+            }
+
+    def format(self) -> str:
+        summary = self.summary()
+        lines = [f"{'span':<40} {'count':>7} {'p50 ms':>9} {'p95 ms':>9}"]
+        for name, stats in summary["latency"].items():
+            lines.append(f"{name:<40} {stats['count']:>7} {stats['p50'] * 1000:>9.2f} {stats['p95'] * 1000:>9.2f}")
+        tokens = summary["tokens_per_episode"]
+        if tokens:
+            lines.append(f"tokens per episode: mean {tokens['mean']:.0f}, p50 {tokens['p50']}, p95 {tokens['p95']}")
+        return "\n".join(lines)
+
+
+class Tracer:
+    """
+    Records spans and events to a sink and/or a Metrics aggregator. bind() returns a tracer
+    sharing both that stamps extra fields (such as the episode id) on every record.
+    """
+    enabled = True
+
+    def __init__(self, sink: JsonlSink = None, metrics: Metrics = None, **fields):
+        self.sink = sink
+        self.metrics = metrics
+        self.fields = fields
+
+    def bind(self, **fields) -> Tracer:
+        return Tracer(self.sink, self.metrics, **self.fields, **fields)
+
+    def span(self, kind: str, **fields) -> Span:
+        return Span(self, kind, fields)
+
+    def event(self, kind: str, **fields):
+        self.emit(kind, **fields)
+
+    def emit(self, kind: str, **fields):
+        record = {"kind": kind, "time": time.time(), **self.fields, **fields}
+        if self.sink is not None:
+            self.sink.write(record)
+        if self.metrics is not None:
+            self.metrics.record(record)
+
+    def close(self):
+        if self.sink is not None:
+            self.sink.close()
+
+
+def cprofile_hook(directory: str) -> Callable:
+    """
+    Profiler hook for the runner: profiles the chosen episode with cProfile and writes
+    episode-<id>.prof to directory. cProfile only sees the event loop thread, and other
+    episodes running at the same time show up too; profile with concurrency 1 for a clean
+    picture, or pass a hook that starts a sampling profiler instead.
+    """
+    @contextmanager
+    def profile(episode_id: int):
+        os.makedirs(directory, exist_ok=True)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(directory, f"episode-{episode_id}.prof"))
+    return profile
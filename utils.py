@@ -1,16 +1,20 @@
 import inspect
 import json
 
-def function_to_schema(func) -> dict:
-    type_map = {
-        str: "string",
-        int: "integer",
-        float: "number",
-        bool: "boolean",
-        list: "array",
-        dict: "object",
-        type(None): "null",
-    }
+TYPE_MAP = {
+    str: "string",
+    int: "integer",
+    float: "number",
+    bool: "boolean",
+    list: "array",
+    dict: "object",
+    type(None): "null",
+}
+# Annotations are plain strings in modules using `from __future__ import annotations`
+TYPE_NAMES = {"None" if t is type(None) else t.__name__: t for t in TYPE_MAP}
+
+def function_to_schema(func, exclude=()) -> dict:
+    type_map = TYPE_MAP
 
     try:
         signature = inspect.signature(func)
@@ -19,10 +23,15 @@ def function_to_schema(func) -> dict:
             f"Failed to get signature for function {func.__name__}: {str(e)}"
         )
 
+    params = [param for param in signature.parameters.values() if param.name not in exclude]
+
     parameters = {}
-    for param in signature.parameters.values():
+    for param in params:
         try:
-            param_type = type_map.get(param.annotation, "string")
+            annotation = param.annotation
+            if isinstance(annotation, str):
+                annotation = TYPE_NAMES.get(annotation, annotation)
+            param_type = type_map.get(annotation, "string")
         except KeyError as e:
             raise KeyError(
                 f"Unknown type annotation {param.annotation} for parameter {param.name}: {str(e)}"
@@ -31,7 +40,7 @@ def function_to_schema(func) -> dict:
 
     required = [
         param.name
-        for param in signature.parameters.values()
+        for param in params
         if param.default == inspect._empty
     ]
 